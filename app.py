@@ -13,6 +13,7 @@ try:
     from generate_csv_only import main as run_csv_export
     # NEU: Datenbank Connector importieren
     from modules.db_connector import DBConnector
+    from modules.data_handler import read_csv_sniffed, read_excel_cached, store_excel_cache
 except ImportError as e:
     print(f"Fehler beim Importieren der Skripte: {e}")
 
@@ -117,9 +118,9 @@ class ArticleAdderWindow(ctk.CTkToplevel):
         try:
             # 1. Datei laden
             if ext in ['.xlsx', '.xls']:
-                df = pd.read_excel(target_file, dtype=str)
+                df = read_excel_cached(target_file)
             else:
-                df = pd.read_csv(target_file, dtype=str, sep=None, engine='python')
+                df = read_csv_sniffed(target_file)
 
             # 2. Neue Zeile erstellen (als DataFrame)
             new_data = {
@@ -136,6 +137,8 @@ class ArticleAdderWindow(ctk.CTkToplevel):
             # 4. Speichern (ohne Index)
             if ext in ['.xlsx', '.xls']:
                 df.to_excel(target_file, index=False)
+                # Frisch geschriebene Tabelle direkt cachen -> nächster Start parst sie nicht erneut
+                store_excel_cache(target_file, df.mask(df == ""))
             else:
                 df.to_csv(target_file, index=False, sep=";", encoding='utf-8')
 
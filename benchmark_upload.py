@@ -0,0 +1,313 @@
+import os
+import sys
+import json
+import time
+import shutil
+import hashlib
+import sqlite3
+import argparse
+import tempfile
+import threading
+import mysql.connector
+from modules.config import OUTPUT_FOLDER, DB_UPLOAD_WORKERS
+from modules.db_connector import DBConnector, get_pool
+from modules.html_generator import HTMLGenerator
+
+# Benchmark für modules/db_connector.py - NIE gegen die Live-DB.
+# Standard ist ein SQLite-Ersatz im Temp-Ordner. Für MySQL/MariaDB (z.B. lokaler Docker-Container)
+# werden eigene BENCH_DB_*-Variablen verwendet, NICHT die DB_*-Zugangsdaten aus der .env.
+#
+#   python benchmark_upload.py --rows 5000
+#   python benchmark_upload.py --rows 5000 --db mysql     (BENCH_DB_HOST/USER/PASSWORD/NAME[/PORT])
+
+# Falls output_JSON leer ist: ein typisches Datenblatt als Vorlage
+FALLBACK_SAMPLE = {
+    "Produktname": "Benchmark Grafikkarte 8GB",
+    "Kategorie": "Grafikkarte",
+    "Allgemein": {"Gerätetyp": "Grafikkarte", "Bustyp": "PCI Express 4.0 x16", "Grafikprozessor": "NVIDIA GeForce RTX 4060"},
+    "Speicher": {"Größe": "8 GB", "Technologie": "GDDR6", "Speicherbandbreite": "272 GB/s"},
+    "Schnittstellen": {"Anschlüsse": "3 x DisplayPort 1.4a, 1 x HDMI 2.1"},
+    "Leistung": {"Boost-Takt": "2475 MHz", "Leistungsaufnahme": "115 W"},
+}
+
+LEGACY_COMMIT_EVERY = 10
+
+
+class Traffic:
+    """ Zählt gesendete Bytes (SQL-Text + Parameter) und Anweisungen über alle Verbindungen/Threads. """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.bytes_sent = 0
+            self.statements = 0
+
+    def add(self, query, params_seq):
+        size = len(query.encode("utf-8"))
+        for params in params_seq:
+            size += sum(len(p.encode("utf-8")) if isinstance(p, str) else 8 for p in (params or ()))
+        with self._lock:
+            self.bytes_sent += size
+            self.statements += 1
+
+
+class CountingCursor:
+    def __init__(self, cursor, traffic):
+        self._cursor = cursor
+        self._traffic = traffic
+
+    def execute(self, query, params=None):
+        self._traffic.add(query, [params])
+        return self._cursor.execute(query, params) if params is not None else self._cursor.execute(query)
+
+    def executemany(self, query, seq):
+        seq = list(seq)
+        self._traffic.add(query, seq)
+        return self._cursor.executemany(query, seq)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class CountingConnection:
+    def __init__(self, conn, traffic):
+        self._conn = conn
+        self._traffic = traffic
+
+    def cursor(self, *args, **kwargs):
+        return CountingCursor(self._conn.cursor(*args, **kwargs), self._traffic)
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+
+def _md5(text):
+    return hashlib.md5(text.encode("utf-8")).hexdigest() if text is not None else None
+
+
+def sqlite_factory(db_path, traffic):
+    def connect():
+        # Autocommit: SQLite kennt nur EINEN Schreiber, so wartet jede Anweisung auf die Sperre (timeout),
+        # statt beim Hochstufen einer offenen Lese-Transaktion sofort mit "database is locked" abzubrechen
+        conn = sqlite3.connect(db_path, timeout=60, check_same_thread=False, isolation_level=None)
+        conn.create_function("MD5", 1, _md5, deterministic=True)
+        return CountingConnection(conn, traffic)
+    return connect
+
+
+def bench_mysql_config():
+    config = {
+        'host': os.getenv('BENCH_DB_HOST', '127.0.0.1'),
+        'port': int(os.getenv('BENCH_DB_PORT', '3306')),
+        'user': os.getenv('BENCH_DB_USER', 'root'),
+        'password': os.getenv('BENCH_DB_PASSWORD', ''),
+        'database': os.getenv('BENCH_DB_NAME', 'marvin_bench'),
+    }
+    if config['host'] == os.getenv('DB_HOST') and config['database'] == os.getenv('DB_NAME'):
+        sys.exit("🛑 BENCH_DB_* zeigt auf die Live-DB aus der .env - Abbruch.")
+    return config
+
+
+def mysql_factory(config, traffic):
+    """ Ungepoolt: jede Verbindung wird neu aufgebaut (Handshake + Login). """
+    return lambda: CountingConnection(mysql.connector.connect(**config), traffic)
+
+
+class PooledBenchConnector(DBConnector):
+    """ Wie der Live-Betrieb: Verbindungen über get_pool/pooled_connection, nur mit den BENCH_DB_*-Zugangsdaten. """
+
+    def __init__(self, html_folder, config, traffic):
+        super().__init__(html_folder=html_folder)
+        self.config = dict(config)
+        self._traffic = traffic
+
+    def _acquire(self):
+        return CountingConnection(super()._acquire(), self._traffic)
+
+
+# --- Testdaten ---
+def load_samples(json_folder, limit=50):
+    """ Echte Datenblätter aus output_JSON als Vorlage (bis zu 'limit'), sonst FALLBACK_SAMPLE. """
+    samples = []
+    if os.path.exists(json_folder):
+        for filename in sorted(os.listdir(json_folder))[:limit * 2]:
+            if not filename.endswith(".json"): continue
+            try:
+                with open(os.path.join(json_folder, filename), 'r', encoding='utf-8') as f:
+                    samples.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+            if len(samples) >= limit: break
+    return samples or [FALLBACK_SAMPLE]
+
+
+def generate_html_files(html_folder, rows, json_folder):
+    """ Schreibt 'rows' HTML-Datenblätter (gerendert wie im Post-Processing). Gibt die Artikelnummern zurück. """
+    generator = HTMLGenerator(json_folder=json_folder, output_folder=html_folder)
+    rendered = [generator.render(sample)[0] for sample in load_samples(json_folder)]
+    art_nrs = []
+    for i in range(rows):
+        art_nr = f"BENCH{i:07d}"
+        with open(os.path.join(html_folder, f"{art_nr}.html"), "w", encoding="utf-8") as f:
+            f.write(rendered[i % len(rendered)] + f"\n<!-- {art_nr} -->")
+        art_nrs.append(art_nr)
+    return art_nrs
+
+
+def seed_table(connect, dialect, html_folder, art_nrs, changed_ratio, missing_ratio):
+    """
+    Legt tartikel neu an. changed_ratio der Artikel hat eine veraltete Beschreibung,
+    missing_ratio fehlt in der DB ganz, der Rest ist bereits aktuell.
+    """
+    text_type = "MEDIUMTEXT" if dialect == "mysql" else "TEXT"
+    key_type = "VARCHAR(255)" if dialect == "mysql" else "TEXT COLLATE NOCASE"
+    conn = connect()
+    cursor = conn.cursor()
+    cursor.execute("DROP TABLE IF EXISTS tartikel")
+    cursor.execute(
+        f"CREATE TABLE tartikel (kArtikel INTEGER PRIMARY KEY, cArtNr {key_type} NOT NULL, cBeschreibung {text_type})"
+    )
+    cursor.execute("CREATE INDEX idx_tartikel_artnr ON tartikel (cArtNr)")
+
+    changed_every = int(1 / changed_ratio) if changed_ratio > 0 else 0
+    missing_every = int(1 / missing_ratio) if missing_ratio > 0 else 0
+    placeholder = "%s" if dialect == "mysql" else "?"
+    batch = []
+    for i, art_nr in enumerate(art_nrs, start=1):
+        if missing_every and i % missing_every == 0: continue
+        with open(os.path.join(html_folder, f"{art_nr}.html"), 'r', encoding='utf-8') as f:
+            content = f.read()
+        if changed_every and i % changed_every == 1 % changed_every:
+            content = "<p>Veraltete Beschreibung</p>"
+        batch.append((i, art_nr, content))
+        if len(batch) >= 500:
+            cursor.executemany(f"INSERT INTO tartikel VALUES ({placeholder}, {placeholder}, {placeholder})", batch)
+            batch = []
+    if batch:
+        cursor.executemany(f"INSERT INTO tartikel VALUES ({placeholder}, {placeholder}, {placeholder})", batch)
+    conn.commit()
+    cursor.close()
+    conn.close()
+
+
+# --- Alternative Upload-Wege zum Vergleich ---
+def legacy_row_by_row(connector, connect):
+    """ Der frühere Massen-Upload: ein UPDATE pro Datei, SELECT bei 0 Zeilen, Commit alle 10 Zeilen. """
+    q = connector._q
+    conn = connect()
+    cursor = conn.cursor()
+    files = [f for f in os.listdir(connector.html_folder) if f.endswith('.html')]
+    for i, filename in enumerate(files):
+        art_nr = os.path.splitext(filename)[0]
+        with open(os.path.join(connector.html_folder, filename), 'r', encoding='utf-8') as f:
+            html_content = f.read()
+        cursor.execute(q("UPDATE tartikel SET cBeschreibung = %s WHERE cArtNr = %s"), (html_content, art_nr))
+        if cursor.rowcount == 0:
+            cursor.execute(q("SELECT cArtNr FROM tartikel WHERE cArtNr = %s"), (art_nr,))
+            cursor.fetchall()
+        if i % LEGACY_COMMIT_EVERY == 0:
+            conn.commit()
+    conn.commit()
+    cursor.close()
+    conn.close()
+    return f"{len(files)} Dateien"
+
+
+def single_uploads(connector, art_nrs):
+    ok = sum(1 for art_nr in art_nrs if connector.export_single_article(art_nr)[0])
+    return f"{ok}/{len(art_nrs)} OK"
+
+
+def run_benchmark(rows=2000, db="sqlite", workers=DB_UPLOAD_WORKERS, single_rows=200,
+                  changed_ratio=0.05, missing_ratio=0.01, json_folder=OUTPUT_FOLDER, log=print):
+    work_dir = tempfile.mkdtemp(prefix="upload_bench_")
+    html_folder = os.path.join(work_dir, "output_HTML")
+    os.makedirs(html_folder)
+    traffic = Traffic()
+    if db == "mysql":
+        config = bench_mysql_config()
+        connect = mysql_factory(config, traffic)
+        pooled = PooledBenchConnector(html_folder, config, traffic)
+    else:
+        connect = sqlite_factory(os.path.join(work_dir, "bench.sqlite"), traffic)
+        pooled = None   # SQLite-Ersatz hat keinen Pool
+    connector = DBConnector(html_folder=html_folder, connection_factory=connect, dialect=db)
+
+    try:
+        log(f"🧪 Erzeuge {rows} HTML-Datenblätter aus {json_folder} ...")
+        art_nrs = generate_html_files(html_folder, rows, json_folder)
+        total_mb = sum(os.path.getsize(os.path.join(html_folder, f)) for f in os.listdir(html_folder)) / 1024 / 1024
+        log(f"   {total_mb:.1f} MB HTML | DB: {db} | {changed_ratio:.0%} geändert, {missing_ratio:.0%} fehlen in der DB\n")
+
+        # Fortschritt nicht messen/ausgeben, Fehler (z.B. gescheiterte Shards) aber schon
+        def log_errors(msg):
+            if msg.lstrip().startswith("❌"): log(msg)
+
+        single = art_nrs[:single_rows]
+        # Mit MySQL laufen die Upload-Wege wie im Live-Betrieb über den Pool, zum Vergleich zusätzlich ungepoolt
+        uploader = pooled or connector
+        scenarios = [
+            ("Einzel-Upload (export_single_article)" + (", ohne Pool" if pooled else ""), len(single),
+             lambda: single_uploads(connector, single)),
+        ]
+        if pooled:
+            scenarios.append(("Einzel-Upload (export_single_article), mit Pool", len(single), lambda: single_uploads(pooled, single)))
+        scenarios += [
+            ("Alt: UPDATE pro Zeile", rows, lambda: legacy_row_by_row(connector, connect)),
+            ("Massen-Upload ohne Abgleich, 1 Thread", rows,
+             lambda: uploader.export_all_articles(callback_log=log_errors, diff=False, workers=1)),
+            ("Massen-Upload mit MD5-Abgleich, 1 Thread", rows,
+             lambda: uploader.export_all_articles(callback_log=log_errors, diff=True, workers=1)),
+        ]
+        if pooled:
+            scenarios.append((f"Massen-Upload mit MD5-Abgleich, {workers} Threads, ohne Pool", rows,
+                              lambda: connector.export_all_articles(callback_log=log_errors, diff=True, workers=workers)))
+        scenarios.append((f"Massen-Upload mit MD5-Abgleich, {workers} Threads" + (", mit Pool" if pooled else ""), rows,
+                          lambda: uploader.export_all_articles(callback_log=log_errors, diff=True, workers=workers)))
+
+        # Pool vorab aufbauen: der Verbindungsaufbau beim ersten Ausleihen soll nicht in die Messung
+        if pooled: get_pool(pooled.config)
+
+        results = []
+        for label, count, run in scenarios:
+            seed_table(connect, db, html_folder, art_nrs, changed_ratio, missing_ratio)
+            traffic.reset()
+            start = time.perf_counter()
+            outcome = run()
+            elapsed = time.perf_counter() - start
+            results.append({
+                "scenario": label,
+                "rows": count,
+                "seconds": round(elapsed, 3),
+                "rows_per_s": round(count / elapsed, 1) if elapsed else 0,
+                "mb_sent": round(traffic.bytes_sent / 1024 / 1024, 2),
+                "statements": traffic.statements,
+                "result": outcome,
+            })
+
+        log(f"{'Szenario':<60} {'Zeilen':>7} {'Sek.':>8} {'Zeilen/s':>10} {'MB gesendet':>12} {'Anweisungen':>12}")
+        for r in results:
+            log(f"{r['scenario']:<60} {r['rows']:>7} {r['seconds']:>8.3f} {r['rows_per_s']:>10.1f} {r['mb_sent']:>12.2f} {r['statements']:>12}")
+            log(f"   -> {r['result']}")
+        return results
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark für den DB-Upload (nie gegen die Live-DB).")
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--db", choices=["sqlite", "mysql"], default="sqlite")
+    parser.add_argument("--workers", type=int, default=DB_UPLOAD_WORKERS)
+    parser.add_argument("--single", type=int, default=200, help="Anzahl Einzel-Uploads")
+    parser.add_argument("--changed", type=float, default=0.05, help="Anteil veralteter Beschreibungen in der DB")
+    parser.add_argument("--missing", type=float, default=0.01, help="Anteil Artikel, die in der DB fehlen")
+    parser.add_argument("--json-folder", default=OUTPUT_FOLDER)
+    args = parser.parse_args()
+    run_benchmark(args.rows, args.db, args.workers, args.single, args.changed, args.missing, args.json_folder)
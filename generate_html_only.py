@@ -1,4 +1,4 @@
-from modules.config import OUTPUT_FOLDER
+from modules.config import OUTPUT_FOLDER, POSTPROCESS_WORKERS
 from modules.html_generator import HTMLGenerator
 
 def main():
@@ -11,7 +11,7 @@ def main():
             template_path="templates/template.html"
         )
         
-        generator.generate_all()
+        generator.generate_all(workers=POSTPROCESS_WORKERS)
         
     except Exception as e:
         print(f"❌ Ein Fehler ist aufgetreten: {e}")
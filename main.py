@@ -1,18 +1,28 @@
 import os
-import re
 import json
-import time 
 import csv
 import logging
+import threading
+import itertools
+import traceback
 import pandas as pd
-from modules.config import setup_folders, OUTPUT_FOLDER, LOG_FILE
-from modules.prompts import get_prompt_by_category
-from modules.agent import setup_agent
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait, FIRST_COMPLETED
+from modules.config import setup_folders, OUTPUT_FOLDER, LOG_FILE, LEDGER_FILE, MAX_CONCURRENT_ARTICLES, AGENT_CACHE_MODE, POSTPROCESS_WORKERS, DEDUPE_ACROSS_FILES, GAP_FILL_LOW_QUALITY
+from modules.prompts import get_prompt_by_category, classify_product_type, classify_products_batch
+from modules.agent import setup_agent, AGENT_SETTINGS
+from modules.direct_extractor import get_direct_extractor, engine_for_category, DIRECT_SETTINGS
 from modules.logger import log_error
-from modules.html_generator import HTMLGenerator
 from modules.image_fetcher import find_product_image
-from modules.json_mapper import MarvinMapper
+from modules.post_processor import run_post_processing
 from modules.db_connector import DBConnector
+from modules.data_handler import iter_article_chunks, prefetch, read_csv_sniffed, read_excel_cached, STREAM_CHUNK_SIZE
+from modules.job_ledger import JobLedger, DONE, FAILED, LOW_QUALITY, SKIPPED
+from modules.response_cache import get_response_cache, make_cache_key, extract_json, CacheMissError
+from modules.search_cache import get_search_cache
+from modules.dedupe import DedupePlan, normalize_gtin
+from modules.schemas import validate_article
+from modules.gap_filler import fill_gaps, GAP_FILL_SETTINGS
+from modules.spec_store import get_spec_store
 
 # --- LOGGING CONFIG ---
 if os.path.exists(LOG_FILE):
@@ -80,7 +90,7 @@ def read_file_robust(filepath):
     if filepath.lower().endswith(('.xlsx', '.xls')):
         try:
             # dtype=str ist WICHTIG gegen das "E+12" Problem!
-            df = pd.read_excel(filepath, dtype=str)
+            df = read_excel_cached(filepath)
             # Spalten bereinigen
             df.columns = [str(c).strip().replace('"', '') for c in df.columns]
             df.dropna(how='all', inplace=True)
@@ -89,29 +99,31 @@ def read_file_robust(filepath):
             logging.error(f"❌ Fehler beim Lesen der Excel-Datei: {e}")
             return None
 
-    # --- 2. CSV CHECK ---
-    encodings = ['utf-8', 'latin-1', 'cp1252']
-    for enc in encodings:
-        try:
-            df = pd.read_csv(filepath, sep=None, engine='python', dtype=str, encoding=enc).fillna('')
-            
-            if 'Artikelname' in df.columns:
-                df = df[df['Artikelname'].str.strip() != '']
-            elif 'Artikelnummer' in df.columns:
-                df = df[df['Artikelnummer'].str.strip() != '']
-            
-            df.dropna(how='all', inplace=True)
-            return df
-        except UnicodeDecodeError:
-            continue
-        except Exception as e:
-            logging.error(f"❌ Fehler beim Lesen ({enc}): {e}")
-            return None
-            
-    logging.error(f"❌ Konnte Datei nicht lesen (Alle Encodings fehlgeschlagen): {filepath}")
-    return None
+    # --- 2. CSV CHECK (Encoding + Trenner per Stichprobe, dann ein Parse mit der C-Engine) ---
+    try:
+        df = read_csv_sniffed(filepath).fillna('')
+
+        if 'Artikelname' in df.columns:
+            df = df[df['Artikelname'].str.strip() != '']
+        elif 'Artikelnummer' in df.columns:
+            df = df[df['Artikelnummer'].str.strip() != '']
+
+        df.dropna(how='all', inplace=True)
+        return df
+    except Exception as e:
+        logging.error(f"❌ Konnte Datei nicht lesen ({filepath}): {e}")
+        return None
+
+def check_data_quality(data, category=None):
+    """
+    Gibt (is_bad, Hinweis) zurück. Mit Kategorie wird Feld für Feld gegen das Schema geprüft
+    (nur Pflichtfelder zählen, Hinweis nennt die fehlenden), ohne Kategorie-Schema gilt die alte 50%-N/A-Regel.
+    """
+    report = validate_article(data, category) if category else None
+    if report:
+        if not report["is_bad"]: return False, None
+        return True, f"Pflichtfelder {report['required_coverage']:.0%}, fehlt: " + ", ".join(report['missing_required'])
 
-def check_data_quality(data):
     ignored_keys = ["Kategorie", "Produktname", "Bild_URL", "_Original_GTIN", "_Produktname", "_Artikelnummer", "Besonderheiten"]
     total_fields = 0
     na_fields = 0
@@ -120,11 +132,18 @@ def check_data_quality(data):
         total_fields += 1
         if str(value).lower().strip() in ["n/a", "na", "nein", "", "nicht verfügbar", "unknown"]:
             na_fields += 1
-    if total_fields == 0: return True 
-    if (na_fields / total_fields) > 0.5: return True
-    return False
+    if total_fields == 0: return True, None
+    if (na_fields / total_fields) > 0.5: return True, None
+    return False, None
+
+# Schützt die Retry-Liste, wenn mehrere Artikel parallel laufen
+_retry_lock = threading.Lock()
 
 def append_to_retry_csv(row_data):
+    with _retry_lock:
+        _append_to_retry_csv(row_data)
+
+def _append_to_retry_csv(row_data):
     file_exists = os.path.isfile(RETRY_CSV_FILE)
     with open(RETRY_CSV_FILE, mode='a', newline='', encoding='utf-8') as f:
         fieldnames = ['Artikelnummer', 'Artikelname', 'GTIN', 'EAN', 'HAN', 'Hersteller', 'Kategorie']
@@ -135,124 +154,521 @@ def append_to_retry_csv(row_data):
             row_dict['GTIN'] = row_dict['GTIN_Clean']
         writer.writerow(row_dict)
 
-def process_dataframe(df, agent, forced_category=None, stop_event=None):
-    total_items = len(df)
-    if total_items == 0:
-        logging.warning("⚠️  Leere Datei übersprungen.")
-        return "OK"
+SKIP_REASONS = {
+    "invalid": "Name ungültig & keine GTIN",
+    "no_key": "Kein Dateiname ableitbar",
+    "duplicate": "Doppelt in der Datei",
+    "done": "JSON existiert bereits",
+    "ledger": "Laut Ledger erledigt",
+    "dedupe": "Gleicher Artikel (GTIN/Name)",
+    "dedupe_wait": "Wartet auf gleichen Artikel (GTIN/Name)",
+    "spec_store": "GTIN bekannt (Spec-Speicher)",
+}
+
+NAME_BLACKLIST = ["unbekannt", "unknown", "standard", "sonstiges", "n/a", "tba", "siehe artikelname", "bearbeitung", "versand"]
+
+def _first_column(df, candidates, default=''):
+    """ Erste vorhandene Spalte als bereinigte Text-Serie (wie row.get mit Fallback-Kette). """
+    for col in candidates:
+        if col in df.columns:
+            values = df[col].fillna('').astype(str)
+            return values.mask(values.str.strip().str.lower() == 'nan', '')
+    return pd.Series(default, index=df.index, dtype=object)
+
+def prepare_articles(df, output_folder=OUTPUT_FOLDER):
+    """
+    Leitet für ALLE Zeilen auf einmal (vektorisiert) die Arbeitsdaten ab:
+    name, gtin, art_nr, safe_filename (= Job-Schlüssel), json_path, already_done, skip_reason.
+    skip_reason ist leer, wenn der Artikel tatsächlich angereichert werden muss.
+    """
+    prep = pd.DataFrame(index=df.index)
+    prep['name'] = _first_column(df, ['Produktname', 'Artikelname'], default='Unbekannt').str.strip() # Robustere Namensfindung
+    prep['gtin'] = _first_column(df, ['GTIN', 'Original_GTIN']).str.replace('.0', '', regex=False).str.strip()
+    prep['art_nr'] = _first_column(df, ['Artikelnummer', 'ArtNr', 'SKU'])
+
+    name_lower = prep['name'].str.lower()
+    is_bad_name = name_lower.isin(NAME_BLACKLIST) | (prep['name'].str.len() < 3) | name_lower.str.contains('bearbeitung', regex=False)
+    has_no_gtin = prep['gtin'].str.len() < 8 # GTINs sind meist 8, 12, 13 Stellen lang
+
+    # Dateiname: bereinigte Artikelnummer, Fallback Produktname
+    has_art_nr = prep['art_nr'].str.strip() != ''
+    from_art_nr = prep['art_nr'].str.replace(r'[\\/*?:"<>|]', '', regex=True).str.strip().str.replace(' ', '_', regex=False)
+    from_name = prep['name'].str.replace(r'[\\/*?:"<>|]', '', regex=True).str.replace(' ', '_', regex=False).str[:80]
+    prep['safe_filename'] = from_art_nr.where(has_art_nr, from_name)
+    prep['json_path'] = [os.path.join(output_folder, f"{key}.json") for key in prep['safe_filename']]
+
+    # Ein einziges listdir statt os.path.exists pro Zeile
+    existing = set(os.listdir(output_folder)) if os.path.isdir(output_folder) else set()
+    prep['already_done'] = (prep['safe_filename'] + '.json').isin(existing) & (prep['safe_filename'] != '')
 
-    for index, row in df.iterrows():
-        if stop_event and stop_event.is_set():
-            logging.warning("\n🛑 VORGANG ABGEBROCHEN.")
-            break
+    prep['skip_reason'] = ''
+    prep.loc[prep['already_done'], 'skip_reason'] = 'done'
+    prep.loc[prep['safe_filename'].duplicated() & (prep['skip_reason'] == ''), 'skip_reason'] = 'duplicate'
+    prep.loc[prep['safe_filename'] == '', 'skip_reason'] = 'no_key'
+    prep.loc[is_bad_name & has_no_gtin, 'skip_reason'] = 'invalid'
+    return prep
 
-        name = str(row.get('Produktname', row.get('Artikelname', 'Unbekannt'))).strip() # Robustere Namensfindung
+def log_skip_table(prep, total_items):
+    """ Eine kompakte Tabelle statt einer Log-Zeile pro übersprungenem Artikel. """
+    counts = prep['skip_reason'].value_counts()
+    skipped = counts.drop('', errors='ignore')
+    if skipped.empty:
+        return
+    lines = [f"📊 Vorfilter: {counts.get('', 0)}/{total_items} Artikel brauchen einen API-Aufruf."]
+    for reason, count in skipped.items():
+        lines.append(f"   ⏭️  {SKIP_REASONS.get(reason, reason):<28} {count:>6}")
+    logging.info("\n".join(lines))
+
+def _write_from_spec_store(article, specs):
+    data = dict(specs)
+    data["_Original_GTIN"] = article['gtin']
+    data["_Produktname"] = article['name']
+    data["_Artikelnummer"] = str(article['art_nr'])
+    with open(article['json_path'], "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=4)
+
+def _copy_status(data, category=None):
+    """ Kopien erben die Qualität der Quelle -> schlechte Kopien landen wie das Original im Lückenfüller/Retry. """
+    return LOW_QUALITY if check_data_quality(data, category)[0] else DONE
+
+def release_leader(plan, job_key, log_prefix):
+    """ Leader fehlgeschlagen -> Gruppe freigeben. Wartende gleiche Artikel zählen damit NICHT als erledigt. """
+    waiting = plan.release(job_key)
+    if waiting:
+        logging.info(f"♻️  {log_prefix} -> {len(waiting)} wartende gleiche ArtNr wieder offen.")
+    return waiting
+
+def save_result(response_text, row, article, category, log_prefix, forced_category=None, ledger=None, plan=None):
+    """
+    JSON aus der Antwort ziehen, Qualität prüfen, output_JSON schreiben, Ledger/Spec-Speicher/Dedupe pflegen.
+    Gemeinsamer Weg für den interaktiven Lauf und den Batch-Modus.
+    Gibt die gespeicherten Daten zurück, None wenn die Antwort kein gültiges JSON enthielt.
+    """
+    name, gtin, art_nr, safe_filename, json_path = (
+        article.name, article.gtin, article.art_nr, article.safe_filename, article.json_path
+    )
+    data = extract_json(response_text)
+    
+    if data is not None:
+
+        data["_Original_GTIN"] = gtin
+        data["_Produktname"] = name
+        data["_Artikelnummer"] = str(art_nr) 
+        
+        search_name = data.get("Produktname", name)
+        cat_found = forced_category if forced_category else data.get("Kategorie", "")
+        image_url = find_product_image(search_name, category=cat_found)
+        data["Bild_URL"] = image_url if image_url else ""
         
-        gtin = str(row.get('GTIN', row.get('Original_GTIN', ''))).replace('.0', '').strip()
+        # Feld-für-Feld gegen das Kategorie-Schema (Fallback: alte 50%-Regel)
+        is_bad, quality_note = check_data_quality(data, category)
+        if is_bad:
+            if quality_note:
+                logging.warning(f"⚠️  {log_prefix} QUALITÄTS-WARNUNG ({quality_note[:120]}). -> Retry Liste.")
+            else:
+                logging.warning(f"⚠️  {log_prefix} QUALITÄTS-WARNUNG. -> Retry Liste.")
+            append_to_retry_csv(row)
         
-        if name.lower() == 'nan': name = ""
-        if gtin.lower() == 'nan': gtin = ""
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
         
-        blacklist = ["unbekannt", "unknown", "standard", "sonstiges", "n/a", "tba", "siehe artikelname", "bearbeitung", "versand"]
-        is_bad_name = (name.lower() in blacklist) or (len(name) < 3) or ("bearbeitung" in name.lower())
-        has_no_gtin = (len(gtin) < 8) # GTINs sind meist 8, 12, 13 Stellen lang
-
-        if is_bad_name and has_no_gtin:
-            logging.info(f"⏭️  SKIP ({index+1}/{total_items}): '{name}' ist ungültig & keine GTIN.")
-            continue
-        # ------------------------------
+        if not is_bad: logging.info(f"✅ {log_prefix} Gespeichert & Qualität OK.")
+        if ledger: ledger.mark(safe_filename, LOW_QUALITY if is_bad else DONE, quality_note)
+        get_spec_store().put(gtin, data, safe_filename, low_quality=is_bad)
 
-        art_nr = row.get('Artikelnummer', row.get('ArtNr', row.get('SKU', '')))
+        # Gleiche GTIN unter anderen Artikelnummern -> Ergebnis kopieren statt erneut anreichern
+        if plan:
+            copies = plan.fan_out(safe_filename, data)
+            if copies:
+                logging.info(f"♻️  {log_prefix} -> auch für {len(copies)} weitere ArtNr übernommen.")
+                if ledger: ledger.mark_many(copies, LOW_QUALITY if is_bad else DONE)
+        return data
         
-        if art_nr and str(art_nr).strip() != "":
-            safe_filename = re.sub(r'[\\/*?:"<>|]', "", str(art_nr)).strip().replace(" ", "_")
-            log_prefix = f"({index + 1}/{total_items}) ArtNr: {safe_filename}"
+    else:
+        log_error(name, gtin, "Kein JSON gefunden", raw_content=response_text)
+        logging.error(f"❌ {log_prefix} Kein JSON. -> Retry Liste.")
+        append_to_retry_csv(row)
+        if ledger: ledger.mark(safe_filename, FAILED, "Kein JSON gefunden")
+        if plan: release_leader(plan, safe_filename, log_prefix)
+        return None
+
+def _process_row(index, row, article, total_items, agent, forced_category=None, ledger=None, plan=None):
+    """
+    Verarbeitet EINEN Artikel (Suche, JSON, Qualitäts-Check, Speichern).
+    'article' ist die vorab berechnete Zeile aus prepare_articles.
+    Gibt "OK", "SKIP" oder "STOP" (Tavily-Limit) zurück.
+    """
+    name, gtin, art_nr, safe_filename = article.name, article.gtin, article.art_nr, article.safe_filename
+
+    if art_nr.strip() != "":
+        log_prefix = f"({index + 1}/{total_items}) ArtNr: {safe_filename}"
+    else:
+        log_prefix = f"({index + 1}/{total_items}) {name[:20]}..."
+    
+    cat_log = f" [Force: {forced_category}]" if forced_category else " [Auto-Router]"
+    logging.info(f"🔍 {log_prefix}{cat_log} | Starte Suche...")
+
+    try:
+        category = forced_category or classify_product_type(name, gtin)
+        prompt = get_prompt_by_category(name, gtin, forced_category=category)
+
+        # Identischer Prompt + Modell + Tools -> Antwort kommt aus dem Cache statt aus der API
+        if engine_for_category(category) == "direct":
+            settings = DIRECT_SETTINGS
+            response_text = get_response_cache().run(
+                get_direct_extractor(), prompt, settings=settings, product_name=name, gtin=gtin
+            )
         else:
-            safe_filename = re.sub(r'[\\/*?:"<>|]', "", str(name)).replace(" ", "_")[:80]
-            log_prefix = f"({index + 1}/{total_items}) {name[:20]}..."
+            settings = AGENT_SETTINGS
+            response_text = get_response_cache().run(agent, prompt, settings=settings)
+        if save_result(response_text, row, article, category, log_prefix, forced_category, ledger, plan) is None:
+            # Unbrauchbare Antwort nicht beim nächsten Versuch wieder abspielen
+            get_response_cache().delete(make_cache_key(prompt, settings=settings))
 
-        if not safe_filename:
-            continue
+    except CacheMissError:
+        logging.warning(f"💾 {log_prefix} Replay-Modus: Nicht im Cache -> übersprungen.")
+        return "SKIP"
 
-        json_filename = f"{safe_filename}.json"
-        json_path = os.path.join(OUTPUT_FOLDER, json_filename)
-        
-        cat_log = f" [Force: {forced_category}]" if forced_category else " [Auto-Router]"
-        logging.info(f"🔍 {log_prefix}{cat_log} | Starte Suche...")
+    except Exception as e:
+        err_msg = str(e)
+        logging.error(f"❌ {log_prefix} Fehler: {err_msg}")
+        log_error(name, gtin, f"Crash: {err_msg}")
+        append_to_retry_csv(row)
+        if ledger: ledger.mark(safe_filename, FAILED, err_msg)
+        if plan: release_leader(plan, safe_filename, log_prefix)
+        if "432" in err_msg or "quota" in err_msg.lower():
+            logging.critical("\n🛑 TAVILY LIMIT ERREICHT.")
+            return "STOP"
 
-        if os.path.exists(json_path):
-            print(f"⏭️  Bereits fertig.")
-            continue
+    return "OK"
 
-        prompt = get_prompt_by_category(name, gtin, forced_category=forced_category)
+def prefilter_articles(df, forced_category=None, ledger=None, source_file=None, plan=None):
+    """
+    Alles vor dem ersten API-Aufruf: Schlüssel ableiten, Ledger, Spec-Speicher, Dedupe, Router-Batch.
+    Gibt (todo, waiting) zurück: die prepare_articles-Zeilen, die wirklich angereichert werden müssen,
+    und die Zeilen, die auf das Ergebnis eines gleichen Artikels (Dedupe-Leader) warten.
+    """
+    prep = prepare_articles(df)
 
-        try:
-            response_text = agent.run(prompt)
-            json_match = re.search(r'\{.*\}', response_text, re.DOTALL)
-            
-            if json_match:
-                data = json.loads(json_match.group(0))
-                
-                data["_Original_GTIN"] = gtin
-                data["_Produktname"] = name
-                data["_Artikelnummer"] = str(art_nr) 
-                
-                search_name = data.get("Produktname", name)
-                cat_found = forced_category if forced_category else data.get("Kategorie", "")
-                image_url = find_product_image(search_name, category=cat_found)
-                data["Bild_URL"] = image_url if image_url else ""
-                
-                is_bad = check_data_quality(data)
-                if is_bad:
-                    logging.warning(f"⚠️  QUALITÄTS-WARNUNG. -> Retry Liste.")
-                    append_to_retry_csv(row)
-                
-                with open(json_path, "w", encoding="utf-8") as f:
-                    json.dump(data, f, ensure_ascii=False, indent=4)
-                
-                if not is_bad: logging.info(f"✅ Gespeichert & Qualität OK.")
-                
-            else:
-                log_error(name, gtin, "Kein JSON gefunden", raw_content=response_text)
-                logging.error("❌ Kein JSON. -> Retry Liste.")
-                append_to_retry_csv(row)
+    if ledger is not None:
+        keyed = prep[prep['safe_filename'] != '']
+        new_jobs = ledger.register(
+            zip(keyed['safe_filename'], keyed['art_nr'], keyed['gtin'], keyed['name']),
+            source_file=source_file, category=forced_category
+        )
+        # Vorfilter-Ergebnisse gesammelt ins Ledger schreiben
+        ledger.mark_many(keyed.loc[keyed['skip_reason'] == 'invalid', 'safe_filename'], SKIPPED)
+        ledger.mark_many([key for key in keyed.loc[keyed['already_done'], 'safe_filename'] if ledger.should_process(key)], DONE)
+        # JSON gelöscht -> Artikel soll neu angereichert werden, auch wenn das Ledger ihn als erledigt führt
+        reopened = ledger.reopen(keyed.loc[keyed['skip_reason'] == '', 'safe_filename'])
+        if reopened: logging.info(f"📒 Ledger: {reopened} gelöschte JSONs werden neu angereichert.")
+        is_open = [ledger.should_process(key) for key in prep['safe_filename']]
+        prep.loc[(prep['skip_reason'] == '') & ~pd.Series(is_open, index=prep.index), 'skip_reason'] = 'ledger'
+        logging.info(f"📒 Ledger: {new_jobs} neu registriert.")
 
-        except Exception as e:
-            err_msg = str(e)
-            logging.error(f"❌ Fehler: {err_msg}")
-            log_error(name, gtin, f"Crash: {err_msg}")
-            append_to_retry_csv(row)
-            if "432" in err_msg or "quota" in err_msg.lower():
-                logging.critical("\n🛑 TAVILY LIMIT ERREICHT.")
-                return "STOP"
+    # Bekannte GTINs: JSON direkt aus dem Spec-Speicher, ohne Prompt und LLM-Aufruf
+    open_rows = prep[prep['skip_reason'] == '']
+    known = get_spec_store().get_many(open_rows['gtin']) if not open_rows.empty else {}
+    if known:
+        served = []
+        for index, article in open_rows.iterrows():
+            specs = known.get(normalize_gtin(article['gtin']))
+            if specs is None: continue
+            _write_from_spec_store(article, specs)
+            served.append(article['safe_filename'])
+            prep.at[index, 'skip_reason'] = 'spec_store'
+        if ledger and served: ledger.mark_many(served, DONE)
+
+    # Artikel, die es dateiübergreifend schon gibt: vorhandene JSON kopieren bzw. auf den Leader warten
+    if plan is not None:
+        copied = {DONE: [], LOW_QUALITY: []}
+        for index, key in prep.loc[prep['skip_reason'] == '', 'safe_filename'].items():
+            decision = plan.claim(key)
+            data = plan.copy_from_source(key) if decision == "copy" else None
+            if data is not None:
+                copied[_copy_status(data, forced_category)].append(key)
+                prep.at[index, 'skip_reason'] = 'dedupe'
+            elif decision == "wait":
+                prep.at[index, 'skip_reason'] = 'dedupe_wait'
+        if ledger:
+            for status, keys in copied.items(): ledger.mark_many(keys, status)
+
+    log_skip_table(prep, len(df))
+    todo = prep[prep['skip_reason'] == '']
+    waiting = prep[prep['skip_reason'] == 'dedupe_wait']
+    if todo.empty:
+        return todo, waiting
+
+    # Auto-Router: Alle unbekannten Namen der Datei in wenigen Batch-Anfragen vorab zuordnen.
+    # Die Ergebnisse landen im Router-Cache, get_prompt_by_category trifft danach nur noch den Cache.
+    if not forced_category:
+        classify_products_batch(list(zip(todo['name'], todo['gtin'])))
+
+    return todo, waiting
+
+def process_dataframe(df, agent, forced_category=None, stop_event=None, max_workers=None, ledger=None, source_file=None, plan=None):
+    """
+    Arbeitet alle Zeilen eines DataFrames ab.
+    Bei max_workers > 1 laufen mehrere Artikel gleichzeitig (Thread-Pool),
+    die Ausgaben (JSON, Retry-Liste, Error-Log) bleiben identisch.
+    Mit 'ledger' werden nur Zeilen angefasst, die laut Job-Ledger noch offen sind.
+    """
+    if df.empty:
+        logging.warning("⚠️  Leere Datei übersprungen.")
+        return "OK"
+    # Blöcke behalten die Zeilennummern der Datei -> Fortschritt "(Zeile/bisher gelesen)" zeigt auf die echte Zeile
+    total_items = int(df.index.max()) + 1
 
-        time.sleep(1)
+    todo, waiting = prefilter_articles(df, forced_category, ledger, source_file, plan)
+    status = "OK"
+    if not todo.empty:
+        status = _run_jobs(df, todo, total_items, agent, forced_category, stop_event, max_workers, ledger, plan)
+
+    # Erst wenn die Leader dieses Blocks fertig sind: wartende gleiche Artikel nachziehen
+    if waiting.empty or status == "STOP" or (stop_event and stop_event.is_set()):
+        return status
+    return _resolve_waiting(df, waiting, total_items, agent, forced_category, stop_event, ledger, plan)
+
+def _run_jobs(df, todo, total_items, agent, forced_category=None, stop_event=None, max_workers=None, ledger=None, plan=None):
+    """ Reichert die todo-Zeilen an - sequentiell oder im Thread-Pool. Gibt "OK" oder "STOP" zurück. """
+    # Nur noch Zeilen, die wirklich einen API-Aufruf brauchen
+    jobs = zip(df.loc[todo.index].iterrows(), todo.itertuples(index=False))
+
+    if max_workers is None:
+        max_workers = MAX_CONCURRENT_ARTICLES
+
+    # --- Sequentieller Modus (alter Ablauf) ---
+    if max_workers <= 1:
+        for (index, row), article in jobs:
+            if stop_event and stop_event.is_set():
+                logging.warning("\n🛑 VORGANG ABGEBROCHEN.")
+                break
+            # Kein festes sleep mehr: Gedrosselt wird pro Anbieter im Rate-Limiter
+            status = _process_row(index, row, article, total_items, agent, forced_category, ledger, plan)
+            if status == "STOP": return "STOP"
+        return "OK"
+
+    # --- Paralleler Modus 🚀 ---
+    # Es werden nie mehr als max_workers Artikel gleichzeitig "in flight" gehalten,
+    # damit ein ABBRECHEN-Klick nicht erst tausende vorab eingereihte Jobs abwarten muss.
+    logging.info(f"⚡ Parallel-Modus: {max_workers} Artikel gleichzeitig.")
+    status = "OK"
+    in_flight = set()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            cancelled = stop_event is not None and stop_event.is_set()
+            if cancelled or status == "STOP":
+                if cancelled: logging.warning("\n🛑 VORGANG ABGEBROCHEN. Warte auf laufende Artikel...")
+                break
+
+            # Freie Slots auffüllen
+            while len(in_flight) < max_workers:
+                try:
+                    (index, row), article = next(jobs)
+                except StopIteration:
+                    break
+                in_flight.add(executor.submit(_process_row, index, row, article, total_items, agent, forced_category, ledger, plan))
+
+            if not in_flight:
+                break
+
+            finished, in_flight = wait(in_flight, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in finished:
+                if future.result() == "STOP":
+                    status = "STOP"
+
+        # Laufende Artikel sauber zu Ende bringen (agent.run lässt sich nicht unterbrechen)
+        for future in in_flight:
+            if future.result() == "STOP":
+                status = "STOP"
+
+    return status
+
+def _resolve_waiting(df, waiting, total_items, agent, forced_category=None, stop_event=None, ledger=None, plan=None):
+    """
+    Zeilen, die auf ihren Dedupe-Leader gewartet haben: Ergebnis liegt vor -> Kopie,
+    Leader fehlgeschlagen -> selbst anreichern, Leader noch offen -> bleibt im Ledger offen (nächster Lauf).
+    """
+    still_waiting = 0
+    for (index, row), article in zip(df.loc[waiting.index].iterrows(), waiting.itertuples(index=False)):
+        if stop_event and stop_event.is_set(): break
+        if os.path.exists(article.json_path): continue   # fan_out hat schon kopiert
+        decision = plan.claim(article.safe_filename)
+        data = plan.copy_from_source(article.safe_filename) if decision == "copy" else None
+        if data is not None:
+            if ledger: ledger.mark(article.safe_filename, _copy_status(data, forced_category))
+        elif decision == "lead":
+            if _process_row(index, row, article, total_items, agent, forced_category, ledger, plan) == "STOP":
+                return "STOP"
+        else:
+            still_waiting += 1
+    if still_waiting:
+        logging.info(f"♻️  {still_waiting} gleiche Artikel warten weiter auf ihren Leader -> bleiben offen.")
     return "OK"
 
-def main(stop_event=None):
-    setup_folders()
-    agent = setup_agent()
-    
-    logging.info("🚀 Starte 'Folder-Mode' Verarbeitung (Jetzt mit Excel-Support!)...")
-    
+def process_file(file_path, agent, forced_category=None, stop_event=None, ledger=None, plan=None):
+    """
+    Liest eine Eingabedatei blockweise und arbeitet sie ab. Während ein Block angereichert wird,
+    parst ein Hintergrund-Thread schon den nächsten. Unveränderte, fertige Dateien werden gar nicht erst gelesen.
+    """
+    if ledger and ledger.is_file_complete(file_path, OUTPUT_FOLDER):
+        logging.info(f"⏭️  Unverändert & laut Ledger komplett: {file_path}")
+        return "OK"
+
+    status = "OK"
+    fully_read = False
+    block_errors = 0
+    chunks = prefetch(iter_article_chunks(file_path, STREAM_CHUNK_SIZE))
+    try:
+        for block_no in itertools.count(1):
+            if stop_event and stop_event.is_set():
+                break
+            # Nur das Lesen/Parsen gilt als Lesefehler - Fehler beim Verarbeiten werden unten separat geloggt
+            try:
+                df = next(chunks)
+            except StopIteration:
+                fully_read = True
+                break
+            except Exception as e:
+                logging.error(f"❌ Fehler beim Lesen von {file_path} (Block {block_no}): {e}")
+                return "OK"
+            if df.empty:
+                continue
+            if block_no > 1 or len(df) >= STREAM_CHUNK_SIZE:
+                logging.info(f"📦 Block {block_no} ({len(df)} Zeilen)")
+            try:
+                status = process_dataframe(df, agent, forced_category=forced_category, stop_event=stop_event,
+                                           ledger=ledger, source_file=file_path, plan=plan)
+            except Exception as e:
+                logging.exception(f"❌ Verarbeitungsfehler in {file_path} (Block {block_no}): {e!r}")
+                log_error(os.path.basename(file_path), "", f"Verarbeitungsfehler Block {block_no}: {e!r}",
+                          raw_content=traceback.format_exc())
+                block_errors += 1
+                continue
+            if status == "STOP":
+                break
+    finally:
+        chunks.close()
+
+    # Nur komplett gelesene Dateien merken, sonst fehlen Zeilen aus ungelesenen Blöcken im Ledger
+    # (und nur ohne Verarbeitungsfehler - die Datei soll beim nächsten Lauf erneut geprüft werden)
+    if ledger and fully_read and not block_errors: ledger.mark_file(file_path)
+    return status
+
+def _gap_fill_one(job, ledger, stop_event=None, quota_hit=None):
+    """
+    Füllt die Lücken EINER vorhandenen JSON mit schlechter Qualität. Gibt die Anzahl gefüllter Felder zurück.
+    quota_hit: geteiltes Event - ist das Tavily-Limit erreicht, startet kein Job mehr eine Suche.
+    """
+    job_key, art_nr, gtin, name, category = job
+    if stop_event and stop_event.is_set(): return 0
+    if quota_hit and quota_hit.is_set(): return 0
+
+    json_path = os.path.join(OUTPUT_FOLDER, f"{job_key}.json")
+    try:
+        with open(json_path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        name = name or data.get("_Produktname", "")
+        gtin = gtin or data.get("_Original_GTIN", "")
+        category = category or classify_product_type(name, gtin)
+
+        filled = fill_gaps(
+            data, category, name, gtin,
+            runner=lambda filler, prompt, **kwargs: get_response_cache().run(filler, prompt, settings=GAP_FILL_SETTINGS, **kwargs)
+        )
+    except CacheMissError:
+        return 0
+    except Exception as e:
+        err_msg = str(e)
+        logging.error(f"❌ Lückenfüller {job_key}: {err_msg}")
+        if "432" in err_msg or "quota" in err_msg.lower():
+            if quota_hit: quota_hit.set()
+            raise
+        # Als Versuch zählen, sonst läuft ein dauerhaft scheiternder Artikel jeden Lauf erneut (MAX_JOB_ATTEMPTS)
+        ledger.mark(job_key, LOW_QUALITY, err_msg)
+        return 0
+
+    is_bad, note = check_data_quality(data, category)
+    if filled:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=4)
+        get_spec_store().put(gtin, data, job_key, low_quality=is_bad)
+
+    ledger.mark(job_key, LOW_QUALITY if is_bad else DONE, note)
+    status = "noch lückenhaft" if is_bad else "Qualität OK"
+    logging.info(f"🩹 ArtNr: {job_key} | {len(filled)} Felder ergänzt -> {status}")
+    return len(filled)
+
+def gap_fill_pass(ledger, stop_event=None, max_workers=None):
+    """
+    Retry-Durchlauf für Artikel mit schlechter Qualität: Statt Suche + Extraktion komplett zu wiederholen,
+    werden nur die fehlenden Felder der vorhandenen JSON nachgefragt (eine Suche + ein kleiner LLM-Aufruf).
+    """
+    jobs = [job for job in ledger.jobs_with_status(LOW_QUALITY) if os.path.exists(os.path.join(OUTPUT_FOLDER, f"{job[0]}.json"))]
+    if not jobs:
+        return 0
+
+    logging.info(f"\n🩹 Lückenfüller: {len(jobs)} Artikel mit schlechter Qualität werden gezielt ergänzt...")
+    quota_hit = threading.Event()
+    total = 0
+    with ThreadPoolExecutor(max_workers=max_workers or MAX_CONCURRENT_ARTICLES) as executor:
+        futures = [executor.submit(_gap_fill_one, job, ledger, stop_event, quota_hit) for job in jobs]
+        for future in as_completed(futures):
+            try:
+                total += future.result()
+            except Exception as e:
+                # Tavily-Limit: eingereihte Jobs verwerfen statt sie alle noch ablaufen zu lassen
+                quota_hit.set()
+                executor.shutdown(wait=False, cancel_futures=True)
+                logging.critical(f"\n🛑 Lückenfüller abgebrochen: {e}")
+                break
+    logging.info(f"🩹 Lückenfüller fertig: {total} Felder ergänzt.")
+    return total
+
+def build_dedupe_plan(input_files, ledger=None):
+    """
+    Planungs-Durchlauf über alle Eingabedateien: gruppiert gleiche Artikel (GTIN, sonst Name),
+    damit jede Gruppe nur EINMAL angereichert wird. Dank Excel-Cache/Format-Erkennung kostet das kaum Zeit.
+    """
+    plan = DedupePlan()
+    for file_path, _, _ in input_files:
+        try:
+            for df in iter_article_chunks(file_path):
+                prep = prepare_articles(df)
+                if ledger is not None:
+                    ledger.reopen(prep.loc[prep['skip_reason'] == '', 'safe_filename'])
+                    finished = ~prep['safe_filename'].map(ledger.should_process)
+                    prep.loc[(prep['skip_reason'] == '') & finished, 'skip_reason'] = 'ledger'
+                plan.add(prep)
+        except Exception as e:
+            logging.warning(f"⚠️  Dedupe-Planung: {file_path} übersprungen ({e})")
+
+    stats = plan.stats()
+    if stats['duplicates']:
+        logging.info(
+            f"♻️  Dedupe: {stats['groups']} Artikel kommen mehrfach vor -> "
+            f"bis zu {stats['duplicates']} API-Aufrufe werden eingespart."
+        )
+    return plan
+
+def collect_input_files():
+    """
+    1. ROOT (unsortiert), 2. UNTERORDNER (sortiert) -> Liste von (Pfad, Zwangs-Kategorie, Log-Text).
+    Wird erst komplett gesammelt, damit über alle Dateien hinweg geplant werden kann.
+    """
     # Hilfsfunktion um zu prüfen ob es eine relevante Datei ist
     def is_data_file(f):
         if f.startswith("~$"): return False
         return f.lower().endswith((".csv", ".xlsx", ".xls"))
 
-    # 1. Scanne ROOT (Unsortiert)
+    input_files = []
     if os.path.exists(INPUT_FOLDER):
         root_files = [f for f in os.listdir(INPUT_FOLDER) if is_data_file(f) and os.path.isfile(os.path.join(INPUT_FOLDER, f))]
         
         for file_name in root_files:
-            file_path = os.path.join(INPUT_FOLDER, file_name)
-            logging.info(f"\n📂 Lade unsortierte Datei: {file_name}")
-            df = read_file_robust(file_path)
-            if df is not None:
-                status = process_dataframe(df, agent, forced_category=None, stop_event=stop_event)
-                if status == "STOP": return
-
-        # 2. Scanne UNTERORDNER (Sortiert)
+            input_files.append((os.path.join(INPUT_FOLDER, file_name), None, f"unsortierte Datei: {file_name}"))
+
         subdirs = [d for d in os.listdir(INPUT_FOLDER) if os.path.isdir(os.path.join(INPUT_FOLDER, d))]
         
         for subdir in subdirs:
@@ -263,40 +679,68 @@ def main(stop_event=None):
             data_files = [f for f in os.listdir(subdir_path) if is_data_file(f)]
             
             for file_name in data_files:
-                file_path = os.path.join(subdir_path, file_name)
-                logging.info(f"\n📂 Lade Kategorie-Datei ({forced_cat}): {subdir}/{file_name}")
-                
-                df = read_file_robust(file_path)
-                if df is not None:
-                    status = process_dataframe(df, agent, forced_category=forced_cat, stop_event=stop_event)
-                    if status == "STOP": return
+                input_files.append((os.path.join(subdir_path, file_name), forced_cat, f"Kategorie-Datei ({forced_cat}): {subdir}/{file_name}"))
+
+    return input_files
 
-    # Post-Processing
+def main(stop_event=None):
+    setup_folders()
+    agent = setup_agent()
+    
+    logging.info("🚀 Starte 'Folder-Mode' Verarbeitung (Jetzt mit Excel-Support!)...")
+
+    # Job-Ledger: Fortschritt sofort sichtbar, fertige Artikel werden in O(1) übersprungen
+    # Im Replay-Modus (nur Cache) wird bewusst OHNE Ledger gearbeitet, damit gelöschte JSONs neu entstehen.
+    ledger = None
+    if AGENT_CACHE_MODE == "replay":
+        logging.info("💾 Replay-Modus: Agent-Antworten kommen ausschließlich aus dem Cache.")
+    else:
+        ledger = JobLedger(LEDGER_FILE)
+        imported = ledger.import_existing_outputs(OUTPUT_FOLDER)
+        if imported:
+            logging.info(f"📒 Ledger: {imported} vorhandene JSONs als erledigt übernommen.")
+        counts = ledger.summary()
+        logging.info(
+            f"📒 Ledger-Stand: {counts['done']} fertig | {counts['low_quality']} schlechte Qualität | "
+            f"{counts['failed']} fehlgeschlagen | {counts['pending']} offen | {counts['skipped']} übersprungen"
+        )
+
+    imported = get_spec_store().import_folder(OUTPUT_FOLDER, is_bad=lambda data: check_data_quality(data)[0])
+    if imported:
+        logging.info(f"🧬 Spec-Speicher: {imported} vorhandene JSONs nach GTIN übernommen.")
+    
+    input_files = collect_input_files()
+    plan = build_dedupe_plan(input_files, ledger) if DEDUPE_ACROSS_FILES else None
+
+    for file_path, forced_cat, label in input_files:
+        logging.info(f"\n📂 Lade {label}")
+        status = process_file(file_path, agent, forced_category=forced_cat, stop_event=stop_event, ledger=ledger, plan=plan)
+        if status == "STOP": return
+
+    if ledger and GAP_FILL_LOW_QUALITY:
+        gap_fill_pass(ledger, stop_event=stop_event)
+
+    if plan:
+        stats = plan.stats()
+        logging.info(f"♻️  Dedupe: {stats['copies']} JSONs kopiert statt angereichert = {stats['copies']} API-Aufrufe gespart.")
+
+    search_stats = get_search_cache().stats()
+    logging.info(
+        f"🔎 Such-Cache: {search_stats['hits']} Treffer | {search_stats['misses']} Misses "
+        f"({search_stats['expired']} abgelaufen) | Trefferquote {search_stats['hit_rate']}%"
+    )
+
+    # Post-Processing (HTML + Marvin-JSON), verteilt auf alle Kerne
     print("\n" + "="*50)
     logging.info("🔄 Starte Post-Processing...")
-    mapper = MarvinMapper(output_folder="output_JSON_Marvin")
-    html_gen = None
-    try:
-        html_gen = HTMLGenerator(json_folder=OUTPUT_FOLDER, output_folder="output_HTML", template_path="templates/template.html")
-    except: pass
-
-    if os.path.exists(OUTPUT_FOLDER):
-        for filename in os.listdir(OUTPUT_FOLDER):
-            if filename.endswith(".json"):
-                file_path = os.path.join(OUTPUT_FOLDER, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f: data = json.load(f)
-                    
-                    # Hier wird das HTML erzeugt
-                    html_c = ""
-                    if html_gen:
-                         generated_path = html_gen.generate_single(filename)
-                         if generated_path and os.path.exists(generated_path):
-                             with open(generated_path, 'r', encoding='utf-8') as hf:
-                                 html_c = hf.read()
-                    mapper.create_json(filename, data, html_content=html_c)
-                except Exception as e:
-                    logging.error(f"❌ Fehler Mapper {filename}: {e}")
+    run_post_processing(
+        OUTPUT_FOLDER,
+        html_folder="output_HTML",
+        template_path="templates/template.html",
+        marvin_folder="output_JSON_Marvin",
+        workers=POSTPROCESS_WORKERS,
+        log=logging.info
+    )
 
     logging.info("✅ FERTIG.")
 
@@ -2,22 +2,85 @@ from langchain.agents import initialize_agent, AgentType
 from langchain_openai import ChatOpenAI
 from langchain_community.tools.tavily_search import TavilySearchResults
 from .config import OPENAI_API_KEY, TAVILY_API_KEY, MODEL_NAME
+from .rate_limiter import get_limiter, make_http_client
+from .search_cache import get_search_cache
+
+# Alles, was die Antwort des Agenten beeinflusst (fließt auch in den Cache-Schlüssel ein)
+AGENT_SETTINGS = {
+    "agent_type": "chat-zero-shot-react-description",
+    "temperature": 0,
+    "search_tool": "tavily",
+    "max_results": 3,
+    "max_iterations": 12,
+    "early_stopping_method": "generate",
+}
+
+
+class TavilyQuotaError(Exception):
+    """ Tavily meldet 432 (Kontingent aufgebraucht) -> Lauf muss gestoppt werden. """
+
+
+class ThrottledTavilySearch(TavilySearchResults):
+    """
+    Tavily-Suche hinter dem Such-Cache und dem geteilten Rate-Limiter.
+    LangChain fängt Fehler im Tool ab und gibt sie als Text zurück - deshalb
+    werten wir diesen Text hier aus, statt erst hinterher im main-Loop.
+    """
+    max_attempts: int = 3
+
+    def _cache_params(self):
+        return {
+            "max_results": self.max_results,
+            "search_depth": self.search_depth,
+            "include_domains": self.include_domains,
+            "exclude_domains": self.exclude_domains,
+            "include_raw_content": self.include_raw_content,
+        }
+
+    def _run(self, query, run_manager=None):
+        cache = get_search_cache()
+        cached = cache.get(query, self._cache_params())
+        if cached is not None:
+            return cached["content"], cached["raw"]
+
+        limiter = get_limiter("tavily")
+        for attempt in range(self.max_attempts):
+            limiter.acquire()
+            content, raw = super()._run(query, run_manager)
+
+            if not isinstance(content, str):
+                limiter.report_success()
+                cache.put(query, {"content": content, "raw": raw}, self._cache_params())
+                return content, raw
+
+            error_text = content.lower()
+            if "432" in error_text or "quota" in error_text or "usage limit" in error_text:
+                raise TavilyQuotaError(f"Tavily quota erreicht (432): {content}")
+            if "429" in error_text or "too many requests" in error_text:
+                limiter.report_throttle()
+                continue
+            return content, raw
+
+        return content, raw
+
 
 def setup_agent():
     """
     Initialisiert den LangChain Agenten mit Tavily Search und OpenAI.
     """
     # 1. Das LLM (Gehirn)
+    # Der httpx-Client hängt jeden Request an den OpenAI-Limiter (inkl. 429/Retry-After)
     llm = ChatOpenAI(
-        temperature=0,
+        temperature=AGENT_SETTINGS["temperature"],
         model=MODEL_NAME,
-        openai_api_key=OPENAI_API_KEY
+        openai_api_key=OPENAI_API_KEY,
+        http_client=make_http_client("openai")
     )
 
     # 2. Die Tools (Werkzeuge)
-    search = TavilySearchResults(
+    search = ThrottledTavilySearch(
         tavily_api_key=TAVILY_API_KEY,
-        max_results=3  # Etwas weniger Ergebnisse pro Suche, dafür gezielter
+        max_results=AGENT_SETTINGS["max_results"]  # Etwas weniger Ergebnisse pro Suche, dafür gezielter
     )
     
     tools = [search]
@@ -31,8 +94,8 @@ def setup_agent():
         agent=AgentType.CHAT_ZERO_SHOT_REACT_DESCRIPTION, 
         verbose=True,
         handle_parsing_errors=True,
-        max_iterations=12,           # Gib ihm etwas mehr Zeit für komplexe Tabellen
-        early_stopping_method="generate" # Versuch am Ende noch was zu generieren
+        max_iterations=AGENT_SETTINGS["max_iterations"],           # Gib ihm etwas mehr Zeit für komplexe Tabellen
+        early_stopping_method=AGENT_SETTINGS["early_stopping_method"] # Versuch am Ende noch was zu generieren
     )
 
     return agent
\ No newline at end of file
@@ -0,0 +1,201 @@
+import os
+import json
+import time
+import uuid
+from types import SimpleNamespace
+from .config import BATCH_MAX_REQUESTS, BATCH_MAX_FILE_MB, BATCH_POLL_SECONDS
+
+BATCH_ENDPOINT = "/v1/chat/completions"
+
+# Endzustände eines Batch-Jobs laut OpenAI Batch API
+FINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def write_batch_files(requests, folder, prefix="batch", max_requests=BATCH_MAX_REQUESTS, max_mb=BATCH_MAX_FILE_MB):
+    """
+    Schreibt (custom_id, Chat-Completion-Body) als JSONL im OpenAI-Batch-Format.
+    Pro Datei höchstens max_requests Zeilen bzw. max_mb MB (Limits der Batch API). Gibt die Dateipfade zurück.
+    """
+    os.makedirs(folder, exist_ok=True)
+    max_bytes = int(max_mb * 1024 * 1024)
+    paths = []
+    f = None
+    count = size = 0
+    try:
+        for custom_id, body in requests:
+            line = json.dumps(
+                {"custom_id": custom_id, "method": "POST", "url": BATCH_ENDPOINT, "body": body},
+                ensure_ascii=False
+            ) + "\n"
+            line_bytes = len(line.encode("utf-8"))
+            if f is None or count >= max_requests or size + line_bytes > max_bytes:
+                if f: f.close()
+                paths.append(os.path.join(folder, f"{prefix}_{len(paths) + 1:03d}.jsonl"))
+                f = open(paths[-1], "w", encoding="utf-8")
+                count = size = 0
+            f.write(line)
+            count += 1
+            size += line_bytes
+    finally:
+        if f: f.close()
+    return paths
+
+
+def submit_batch(client, path, metadata=None):
+    """ Lädt die JSONL-Datei hoch und startet den Batch-Job (Ergebnis innerhalb von 24h). """
+    with open(path, "rb") as f:
+        uploaded = client.files.create(file=f, purpose="batch")
+    return client.batches.create(
+        input_file_id=uploaded.id,
+        endpoint=BATCH_ENDPOINT,
+        completion_window="24h",
+        metadata=metadata or {},
+    )
+
+
+def wait_for_batch(client, batch_id, poll_seconds=BATCH_POLL_SECONDS, log=print, stop_event=None):
+    """ Fragt den Status ab, bis der Job fertig ist (oder stop_event gesetzt wird). Gibt das Batch-Objekt zurück. """
+    last_status = None
+    while True:
+        batch = client.batches.retrieve(batch_id)
+        counts = getattr(batch, "request_counts", None)
+        status = (batch.status, getattr(counts, "completed", None), getattr(counts, "failed", None))
+        if status != last_status:
+            progress = f" ({counts.completed}/{counts.total} fertig, {counts.failed} Fehler)" if counts else ""
+            log(f"📬 Batch {batch_id}: {batch.status}{progress}")
+            last_status = status
+        if batch.status in FINAL_STATES or (stop_event and stop_event.is_set()):
+            return batch
+        time.sleep(poll_seconds)
+
+
+def _iter_file_lines(client, file_id):
+    if not file_id: return
+    for line in client.files.content(file_id).text.splitlines():
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_batch_results(client, batch):
+    """
+    Liefert (custom_id, Antwort-Text, Fehler) für jede Zeile der Ergebnis- und Fehlerdatei.
+    Genau eins von Antwort-Text und Fehler ist gesetzt.
+    """
+    for record in _iter_file_lines(client, getattr(batch, "output_file_id", None)):
+        response = record.get("response") or {}
+        body = response.get("body") or {}
+        if record.get("error") or response.get("status_code") != 200:
+            error = record.get("error") or body.get("error") or {}
+            yield record["custom_id"], None, error.get("message") or f"HTTP {response.get('status_code')}"
+            continue
+        content = body["choices"][0]["message"].get("content") or ""
+        yield record["custom_id"], content, None
+
+    for record in _iter_file_lines(client, getattr(batch, "error_file_id", None)):
+        error = record.get("error") or ((record.get("response") or {}).get("body") or {}).get("error") or {}
+        yield record["custom_id"], None, error.get("message") or "Batch-Fehler"
+
+
+def _placeholder_from_schema(schema):
+    if schema.get("type") == "object":
+        return {key: _placeholder_from_schema(child) for key, child in schema.get("properties", {}).items()}
+    if schema.get("type") == "array":
+        return []
+    return "N/A"
+
+
+def default_local_handler(body):
+    """ Antwort des lokalen Ersatz-Endpunkts: Schema-konformes JSON, jedes Feld "N/A". """
+    response_format = body.get("response_format") or {}
+    schema = (response_format.get("json_schema") or {}).get("schema")
+    return json.dumps(_placeholder_from_schema(schema) if schema else {}, ensure_ascii=False)
+
+
+class LocalBatchClient:
+    """
+    Lokaler Ersatz für client.files / client.batches der OpenAI-Bibliothek (ohne Netzwerk).
+    Ein Job wird beim ersten retrieve() komplett verarbeitet, handler(body) liefert den Antwort-Text.
+    Dateien und Job-Status liegen im Ordner, damit auch ein Neustart den Job wiederfindet.
+    """
+
+    def __init__(self, folder, handler=None):
+        self.folder = folder
+        self.handler = handler or default_local_handler
+        os.makedirs(folder, exist_ok=True)
+        self.files = SimpleNamespace(create=self._create_file, content=self._file_content)
+        self.batches = SimpleNamespace(create=self._create_batch, retrieve=self._retrieve_batch)
+
+    # --- Dateien ---
+    def _create_file(self, file, purpose="batch"):
+        file_id = f"file-local-{uuid.uuid4().hex[:12]}"
+        data = file.read()
+        with open(os.path.join(self.folder, file_id), "wb") as f:
+            f.write(data if isinstance(data, bytes) else data.encode("utf-8"))
+        return SimpleNamespace(id=file_id, purpose=purpose)
+
+    def _file_content(self, file_id):
+        with open(os.path.join(self.folder, file_id), "r", encoding="utf-8") as f:
+            return SimpleNamespace(text=f.read())
+
+    # --- Batch-Jobs ---
+    def _batch_path(self, batch_id):
+        return os.path.join(self.folder, f"{batch_id}.json")
+
+    def _save_batch(self, state):
+        with open(self._batch_path(state["id"]), "w", encoding="utf-8") as f:
+            json.dump(state, f)
+
+    def _as_batch(self, state):
+        batch = dict(state)
+        batch["request_counts"] = SimpleNamespace(**state["request_counts"])
+        return SimpleNamespace(**batch)
+
+    def _create_batch(self, input_file_id, endpoint=BATCH_ENDPOINT, completion_window="24h", metadata=None):
+        state = {
+            "id": f"batch-local-{uuid.uuid4().hex[:12]}",
+            "status": "validating",
+            "input_file_id": input_file_id,
+            "output_file_id": None,
+            "error_file_id": None,
+            "endpoint": endpoint,
+            "metadata": metadata or {},
+            "request_counts": {"total": 0, "completed": 0, "failed": 0},
+        }
+        self._save_batch(state)
+        return self._as_batch(state)
+
+    def _retrieve_batch(self, batch_id):
+        with open(self._batch_path(batch_id), "r", encoding="utf-8") as f:
+            state = json.load(f)
+        if state["status"] not in FINAL_STATES:
+            self._run(state)
+            self._save_batch(state)
+        return self._as_batch(state)
+
+    def _run(self, state):
+        outputs, errors = [], []
+        for request in _iter_file_lines(self, state["input_file_id"]):
+            custom_id = request["custom_id"]
+            try:
+                content = self.handler(request["body"])
+                outputs.append({
+                    "id": f"req-{uuid.uuid4().hex[:12]}",
+                    "custom_id": custom_id,
+                    "response": {
+                        "status_code": 200,
+                        "body": {"choices": [{"index": 0, "message": {"role": "assistant", "content": content}}]},
+                    },
+                    "error": None,
+                })
+            except Exception as e:
+                errors.append({"custom_id": custom_id, "response": None, "error": {"code": "local_error", "message": str(e)}})
+
+        for key, records in (("output_file_id", outputs), ("error_file_id", errors)):
+            if not records: continue
+            file_id = f"file-local-{uuid.uuid4().hex[:12]}"
+            with open(os.path.join(self.folder, file_id), "w", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+            state[key] = file_id
+
+        state["status"] = "completed"
+        state["request_counts"] = {"total": len(outputs) + len(errors), "completed": len(outputs), "failed": len(errors)}
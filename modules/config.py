@@ -13,12 +13,94 @@ INPUT_FILE = "artikel.xlsx"
 OUTPUT_FOLDER = "output_JSON"
 ERROR_FOLDER = "output_errors"
 LOG_FILE = "marvin_pipeline.log"
+LEDGER_FILE = "job_ledger.sqlite"
+CACHE_FOLDER = "cache"
 
 IMAGES_FOLDER = "input_images" 
 
 MODEL_NAME = "gpt-4o-mini" 
 TEMPERATURE = 0 
 
+# --- ANREICHERUNG ---
+# "agent"  = LangChain ReAct-Agent (sucht selbst, bis zu 12 LLM-Runden pro Artikel)
+# "direct" = fester Ablauf: 1-2 Tavily-Suchen + EIN LLM-Aufruf mit JSON-Schema (~2 Netzwerk-Runden)
+EXTRACTION_ENGINE = "agent"
+# Abweichungen pro Kategorie (Name wie in FOLDER_MAPPING / Router), z.B. {"Arbeitsspeicher": "direct"}
+EXTRACTION_ENGINE_BY_CATEGORY = {}
+
+# Qualität: Anteil der Pflichtfelder des Kategorie-Schemas, die gefüllt sein müssen (sonst Retry-Liste)
+QUALITY_MIN_COVERAGE = 0.5
+
+# Artikel mit schlechter Qualität: nur die fehlenden Felder gezielt nachfragen (statt komplett neu anzureichern)
+GAP_FILL_LOW_QUALITY = True
+
+# --- PERFORMANCE ---
+# Wie viele Artikel gleichzeitig angereichert werden (1 = alter, sequentieller Modus)
+MAX_CONCURRENT_ARTICLES = 4
+
+# Prozesse für das Post-Processing (JSON -> HTML/Marvin). None = alle CPU-Kerne, 1 = ein Kern
+POSTPROCESS_WORKERS = None
+
+# Wie oft ein fehlgeschlagener Artikel bei späteren Läufen erneut versucht wird
+MAX_JOB_ATTEMPTS = 3
+
+# Gleiche GTIN (bzw. gleicher Name ohne GTIN) in mehreren Dateien/unter mehreren ArtNr nur EINMAL anreichern
+DEDUPE_ACROSS_FILES = True
+
+# --- CACHES ---
+# Agent-Antworten (Schlüssel = Hash aus Prompt + Modell + Tool-Einstellungen)
+# "on" = lesen & schreiben | "off" = aus | "replay" = nur Cache, KEIN Netzwerk (deterministische Re-Runs)
+AGENT_CACHE_MODE = "on"
+AGENT_CACHE_FILE = os.path.join(CACHE_FOLDER, "agent_responses.sqlite")
+AGENT_CACHE_MAX_MB = 200
+
+# Tavily-Suchergebnisse (normalisierte Anfrage -> Ergebnisse)
+SEARCH_CACHE_FILE = os.path.join(CACHE_FOLDER, "tavily_search.sqlite")
+SEARCH_CACHE_TTL_HOURS = 24 * 14
+
+# AI-Router (Produktname -> Kategorie) für unsortierte Dateien
+ROUTER_CACHE_FILE = os.path.join(CACHE_FOLDER, "router.sqlite")
+
+# GTIN -> fertige Spec-JSON (bekannte Produkte unter neuer ArtNr ohne LLM-Aufruf)
+SPEC_STORE_FILE = os.path.join(CACHE_FOLDER, "spec_store.sqlite")
+
+# Bereits geparste Excel-Dateien (Pickle pro xlsx, gültig solange Größe + Änderungszeit gleich sind)
+EXCEL_CACHE_FOLDER = os.path.join(CACHE_FOLDER, "excel")
+
+# Erlaubte Anfragen pro Sekunde je Anbieter (Token-Bucket, siehe modules/rate_limiter.py)
+# Bei 429 wird automatisch gebremst, danach langsam wieder hochgefahren.
+RATE_LIMITS = {
+    "openai": {"requests_per_second": 8, "burst": 8},
+    "tavily": {"requests_per_second": 1.5, "burst": 3},
+}
+
+# --- DATENBANK-UPLOAD (modules/db_connector.py) ---
+# Massen-Upload: Zeilen pro executemany-Paket in die Temp-Tabelle.
+# Zusätzlich begrenzt auf DB_UPLOAD_BATCH_MB, damit ein Paket unter max_allowed_packet des Servers bleibt.
+DB_UPLOAD_BATCH_ROWS = 500
+DB_UPLOAD_BATCH_MB = 8
+# Vor dem Massen-Upload MD5 der Beschreibungen in der DB abgleichen und nur geänderte Artikel senden
+DB_UPLOAD_DIFF = True
+# Massen-Upload parallel: Artikel werden in Shards zu je DB_UPLOAD_SHARD_ROWS aufgeteilt,
+# bis zu DB_UPLOAD_WORKERS Threads schreiben gleichzeitig (je eigene Pool-Verbindung + eigene Transaktion)
+DB_UPLOAD_WORKERS = 4
+DB_UPLOAD_SHARD_ROWS = 2000
+# Wiederverwendete Verbindungen (Einzel- und Massen-Upload teilen sich den Pool, max. 32).
+# Mindestens DB_UPLOAD_WORKERS, sonst warten die Upload-Threads aufeinander.
+DB_POOL_SIZE = 4
+# Wie lange auf eine freie Verbindung gewartet wird, wenn alle in Benutzung sind (Sekunden)
+DB_POOL_TIMEOUT = 30
+
+# --- BATCH-MODUS (run_batch.py) ---
+# Über-Nacht-Importe über die OpenAI Batch API (günstiger, Ergebnis innerhalb von 24h)
+# "openai" = echte Batch API | "local" = lokaler Ersatz-Endpunkt ohne Netzwerk (Tests, Trockenlauf)
+BATCH_BACKEND = "openai"
+BATCH_FOLDER = "batch_jobs"
+# Limits pro JSONL-Datei laut Batch API (50.000 Anfragen / 200 MB)
+BATCH_MAX_REQUESTS = 50000
+BATCH_MAX_FILE_MB = 190
+BATCH_POLL_SECONDS = 60
+
 # --- API KEYS ---
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 TAVILY_API_KEY = os.getenv("TAVILY_API_KEY")
@@ -1,6 +1,171 @@
 import pandas as pd
 import os
-from .config import INPUT_FOLDER, INPUT_FILE
+import csv
+import codecs
+import pickle
+import hashlib
+import threading
+from .config import INPUT_FOLDER, INPUT_FILE, EXCEL_CACHE_FOLDER
+
+# ==============================================================================
+# 🔎 FORMAT-ERKENNUNG (Encoding + Trennzeichen EINMAL bestimmen, dann schnell parsen)
+# ==============================================================================
+SNIFF_SAMPLE_BYTES = 64 * 1024
+CSV_DELIMITERS = ";,\t|"
+
+_BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16"),
+]
+
+# Passt das Encoding der Stichprobe weiter hinten nicht, wird in dieser Reihenfolge neu geparst
+FALLBACK_ENCODINGS = ("cp1252", "latin-1")
+
+# Pfad -> (mtime_ns, size, (encoding, sep))
+_format_cache = {}
+_format_lock = threading.Lock()
+
+
+def _is_utf8(sample, complete):
+    """
+    Prüft nur die Stichprobe (Byte-Ebene, kein CSV-Parsing).
+    Ist sie nicht die ganze Datei, darf sie mitten in einem Mehrbyte-Zeichen enden (final=False).
+    """
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    try:
+        decoder.decode(sample, final=complete)
+        return True
+    except UnicodeDecodeError:
+        return False
+
+
+def _detect_encoding(sample, complete=True):
+    for bom, encoding in _BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if _is_utf8(sample, complete):
+        return "utf-8"
+    # Windows-Exporte (Ä, Ö, Ü, €). cp1252 kennt 5 Bytes nicht -> dann latin-1 (passt immer)
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        return "latin-1"
+
+
+def _detect_delimiter(text):
+    # Nur vollständige Zeilen an den Sniffer geben
+    if "\n" in text:
+        text = text[:text.rindex("\n")]
+    try:
+        return csv.Sniffer().sniff(text, delimiters=CSV_DELIMITERS).delimiter
+    except csv.Error:
+        # Fallback: Häufigstes Trennzeichen in der Kopfzeile, sonst Semikolon (Standard der Wawi-Exporte)
+        header = text.splitlines()[0] if text else ""
+        counts = {sep: header.count(sep) for sep in CSV_DELIMITERS}
+        best = max(counts, key=counts.get)
+        return best if counts[best] else ";"
+
+
+def sniff_csv_format(file_path):
+    """
+    Bestimmt (encoding, sep) einer CSV aus einer Byte-Stichprobe (SNIFF_SAMPLE_BYTES) + BOM-Check.
+    Der Rest der Datei wird dafür nicht gelesen. Ergebnis wird pro Pfad + Änderungszeit gemerkt.
+    """
+    stat = os.stat(file_path)
+    with _format_lock:
+        cached = _format_cache.get(file_path)
+        if cached and cached[0] == stat.st_mtime_ns and cached[1] == stat.st_size:
+            return cached[2]
+
+    with open(file_path, "rb") as f:
+        sample = f.read(SNIFF_SAMPLE_BYTES)
+    encoding = _detect_encoding(sample, complete=len(sample) < SNIFF_SAMPLE_BYTES)
+    # errors='ignore': Stichprobe kann mitten in einem Mehrbyte-Zeichen enden
+    sep = _detect_delimiter(sample.decode(encoding, errors="ignore"))
+
+    with _format_lock:
+        _format_cache[file_path] = (stat.st_mtime_ns, stat.st_size, (encoding, sep))
+    return encoding, sep
+
+
+def next_csv_encoding(file_path, failed_encoding):
+    """
+    Das erkannte Encoding passt nicht zur ganzen Datei (z.B. ASCII-Stichprobe, Umlaute erst weiter hinten):
+    nächstes Fallback-Encoding wählen und im Format-Cache merken. latin-1 passt immer.
+    """
+    if failed_encoding == FALLBACK_ENCODINGS[-1]:
+        raise UnicodeError(f"{file_path}: auch {failed_encoding} passt nicht")
+    encoding = FALLBACK_ENCODINGS[FALLBACK_ENCODINGS.index(failed_encoding) + 1] \
+        if failed_encoding in FALLBACK_ENCODINGS else FALLBACK_ENCODINGS[0]
+    stat = os.stat(file_path)
+    _, sep = sniff_csv_format(file_path)
+    with _format_lock:
+        _format_cache[file_path] = (stat.st_mtime_ns, stat.st_size, (encoding, sep))
+    print(f"   ⚠️ {os.path.basename(file_path)}: '{failed_encoding}' passt nicht zur ganzen Datei -> '{encoding}'")
+    return encoding
+
+
+def read_csv_sniffed(file_path, **kwargs):
+    """
+    pd.read_csv mit erkanntem Encoding/Trenner und der schnellen C-Engine. Alles als Text (kein E+12).
+    Das Encoding stammt aus der Stichprobe -> scheitert das Dekodieren weiter hinten, wird mit
+    cp1252 bzw. latin-1 neu geparst (nie Zeichen ersetzen: app.py schreibt die Datei zurück).
+    Bei chunksize kann der Fehler erst beim Iterieren auftreten -> siehe _iter_csv_chunks.
+    """
+    encoding, sep = sniff_csv_format(file_path)
+    while True:
+        try:
+            return pd.read_csv(file_path, sep=sep, encoding=encoding, dtype=str, engine="c", **kwargs)
+        except UnicodeDecodeError:
+            encoding = next_csv_encoding(file_path, encoding)
+
+
+# ==============================================================================
+# 🗄️ EXCEL-CACHE (openpyxl ist langsam -> geparste Tabelle als Pickle daneben legen)
+# ==============================================================================
+def _excel_cache_path(file_path):
+    digest = hashlib.sha1(os.path.abspath(file_path).encode("utf-8")).hexdigest()[:16]
+    return os.path.join(EXCEL_CACHE_FOLDER, f"{digest}.pkl")
+
+
+def load_excel_cache(file_path):
+    """ Gibt das gecachte DataFrame zurück, falls die xlsx seitdem nicht geändert wurde - sonst None. """
+    try:
+        stat = os.stat(file_path)
+        with open(_excel_cache_path(file_path), "rb") as f:
+            entry = pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+        return None
+    if entry.get("size") != stat.st_size or entry.get("mtime") != stat.st_mtime_ns:
+        return None
+    return entry["df"]
+
+
+def store_excel_cache(file_path, df):
+    """ Speichert das DataFrame (Rohdaten wie pd.read_excel(dtype=str)) für die aktuelle Version der Datei. """
+    try:
+        stat = os.stat(file_path)
+        os.makedirs(EXCEL_CACHE_FOLDER, exist_ok=True)
+        cache_path = _excel_cache_path(file_path)
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            pickle.dump({"path": file_path, "size": stat.st_size, "mtime": stat.st_mtime_ns, "df": df},
+                        f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        print(f"   ⚠️ Excel-Cache konnte nicht geschrieben werden: {e}")
+
+
+def read_excel_cached(file_path):
+    """ pd.read_excel(dtype=str) mit Cache. Unveränderte Dateien werden nicht neu geparst. """
+    df = load_excel_cache(file_path)
+    if df is None:
+        df = pd.read_excel(file_path, dtype=str)
+        store_excel_cache(file_path, df)
+    return df
+
 
 def load_csv_optimized():
     file_path = os.path.join(INPUT_FOLDER, INPUT_FILE)
@@ -16,7 +181,7 @@ def load_csv_optimized():
         try:
             # dtype=str ist der Trick: Wir zwingen Python, ALLES als Text zu lesen.
             # Dadurch wird "4711..." nicht zu einer Zahl umgewandelt.
-            df = pd.read_excel(file_path, dtype=str)
+            df = read_excel_cached(file_path)
             
             # Spalten bereinigen (Leerzeichen/Anführungszeichen weg)
             df.columns = [str(c).strip().replace('"', '') for c in df.columns]
@@ -34,42 +199,195 @@ def load_csv_optimized():
             print(f"   ❌ Fehler beim Laden der Excel-Datei: {e}")
             raise ValueError("Konnte Excel-Datei nicht lesen. Sind 'openpyxl' und 'pandas' installiert?")
 
-    # --- 2. STRATEGIE: CSV / TEXT (Robust gegen Formate) ---
-    attempts = [
-        {"encoding": "utf-8", "sep": ";"},
-        {"encoding": "utf-8", "sep": ","},
-        {"encoding": "utf-8", "sep": "\t"},  # Tab-getrennt (Deine Idee!)
-        {"encoding": "latin1", "sep": ";"},   
-        {"encoding": "latin1", "sep": ","},
-        {"encoding": "latin1", "sep": "\t"},
-        {"encoding": "cp1252", "sep": ";"},
-        {"encoding": "cp1252", "sep": ","}
-    ]
-
-    for attempt in attempts:
-        enc = attempt["encoding"]
-        sep = attempt["sep"]
-        
+    # --- 2. STRATEGIE: CSV / TEXT (Encoding + Trenner werden erkannt, nur EIN Parse) ---
+    try:
+        df = read_csv_sniffed(file_path)
+    except Exception as e:
+        raise ValueError(f"CRITICAL: Die Datei konnte nicht gelesen werden ({e}).")
+
+    # Spalten bereinigen
+    df.columns = [c.strip().replace('"', '') for c in df.columns]
+
+    if 'Artikelname' not in df.columns and 'Artikelnummer' not in df.columns:
+        raise ValueError(f"CRITICAL: Die Datei konnte mit keinem gängigen Format (Excel, UTF-8/ANSI, Semikolon/Komma/Tab) gelesen werden.")
+
+    encoding, sep = sniff_csv_format(file_path)
+    print(f"   ✅ CSV/TXT geladen mit Encoding='{encoding}' und Trenner='{repr(sep)}'")
+
+    df = df.dropna(how='all')
+
+    if 'GTIN' in df.columns and 'GTIN_Clean' not in df.columns:
+        df['GTIN_Clean'] = df['GTIN'].fillna('')
+    elif 'GTIN_Clean' not in df.columns:
+        df['GTIN_Clean'] = ''
+
+    return df
+
+# ==============================================================================
+# 🌊 STREAMING-READER (große Exporte blockweise statt komplett in den Speicher)
+# ==============================================================================
+STREAM_CHUNK_SIZE = 500
+
+
+def _clean_chunk(df, drop_empty_names=True):
+    """
+    Gleiche Bereinigung wie main.read_file_robust, aber pro Block.
+    Der Index bleibt die Datenzeile in der Datei (0-basiert, ab Block 2 also nicht wieder bei 0).
+    """
+    df.columns = [str(c).strip().replace('"', '') for c in df.columns]
+    df = df.fillna('')
+    if drop_empty_names:
+        if 'Artikelname' in df.columns:
+            df = df[df['Artikelname'].str.strip() != '']
+        elif 'Artikelnummer' in df.columns:
+            df = df[df['Artikelnummer'].str.strip() != '']
+    return df[(df != '').any(axis=1)]
+
+
+def _excel_cell_to_str(value):
+    """ Entspricht pd.read_excel(dtype=str): ganzzahlige Floats ohne '.0' (kein E+12 Problem). """
+    if value is None: return ''
+    if isinstance(value, float) and value.is_integer():
+        value = int(value)
+    return str(value)
+
+
+def _excel_header(cells):
+    """
+    Spaltennamen wie pd.read_excel: leere Zellen -> 'Unnamed: N', doppelte Namen -> 'Name.1', 'Name.2' ...
+    So sehen main, smart_sorter und app.py dieselben Spalten, egal ob Cache oder Streaming gelesen hat.
+    """
+    names = [_excel_cell_to_str(c) for c in cells]
+    unnamed = [i for i, name in enumerate(names) if name == '']
+    for i in unnamed:
+        names[i] = f"Unnamed: {i}"
+    # Gleiche Reihenfolge wie pandas (benannte Spalten zuerst), vorhandene Namen werden übersprungen
+    counts = {}
+    for i in [i for i in range(len(names)) if i not in unnamed] + unnamed:
+        name = original = names[i]
+        count = counts.get(name, 0)
+        while count > 0:
+            counts[original] = count + 1
+            name = f"{original}.{count}"
+            count = count + 1 if name in names else counts.get(name, 0)
+        names[i] = name
+        counts[name] = count + 1
+    return names
+
+
+def _iter_excel_chunks(file_path, chunksize):
+    # Cache nutzen, falls read_excel_cached ihn angelegt hat. Der Streaming-Weg schreibt selbst KEINEN Cache,
+    # sonst müsste er alle Blöcke bis zum Ende im Speicher halten (= ganze Tabelle, beim concat sogar doppelt).
+    cached = load_excel_cache(file_path)
+    if cached is not None:
+        for start in range(0, len(cached), chunksize):
+            yield _clean_chunk(cached.iloc[start:start + chunksize].copy(), drop_empty_names=False)
+        return
+
+    from openpyxl import load_workbook
+
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        columns = _excel_header(header)
+
+        block = []
+        start = 0
+        for row in rows:
+            values = [_excel_cell_to_str(v) for v in row[:len(columns)]]
+            values += [''] * (len(columns) - len(values))
+            block.append(values)
+            if len(block) >= chunksize:
+                yield _clean_chunk(pd.DataFrame(block, columns=columns, index=range(start, start + len(block))),
+                                   drop_empty_names=False)
+                start += len(block)
+                block = []
+        if block:
+            yield _clean_chunk(pd.DataFrame(block, columns=columns, index=range(start, start + len(block))),
+                               drop_empty_names=False)
+    finally:
+        wb.close()
+
+
+def _iter_csv_chunks(file_path, chunksize):
+    done_rows = 0
+    while True:
         try:
-            # Auch hier: dtype=str verhindert wissenschaftliche Notation beim Einlesen
-            df = pd.read_csv(file_path, sep=sep, encoding=enc, dtype=str)
-            
-            # Spalten bereinigen
-            df.columns = [c.strip().replace('"', '') for c in df.columns]
-
-            if 'Artikelname' in df.columns or 'Artikelnummer' in df.columns:
-                print(f"   ✅ CSV/TXT geladen mit Encoding='{enc}' und Trenner='{repr(sep)}'")
-                
-                df = df.dropna(how='all')
-                
-                if 'GTIN' in df.columns and 'GTIN_Clean' not in df.columns:
-                    df['GTIN_Clean'] = df['GTIN'].fillna('')
-                elif 'GTIN_Clean' not in df.columns:
-                    df['GTIN_Clean'] = ''
-                
-                return df
-                
-        except Exception:
-            continue
-
-    raise ValueError(f"CRITICAL: Die Datei konnte mit keinem gängigen Format (Excel, UTF-8/ANSI, Semikolon/Komma/Tab) gelesen werden.")
\ No newline at end of file
+            reader = read_csv_sniffed(file_path, chunksize=chunksize)
+        except pd.errors.EmptyDataError:
+            return
+        encoding, _ = sniff_csv_format(file_path)
+        # Nach einem Encoding-Wechsel: bereits gelieferte Zeilen überspringen
+        skip = done_rows
+        try:
+            for chunk in reader:
+                if skip:
+                    if len(chunk) <= skip:
+                        skip -= len(chunk)
+                        continue
+                    chunk, skip = chunk.iloc[skip:], 0
+                done_rows += len(chunk)
+                yield _clean_chunk(chunk)
+            return
+        except UnicodeDecodeError:
+            next_csv_encoding(file_path, encoding)
+
+
+def iter_article_chunks(file_path, chunksize=STREAM_CHUNK_SIZE):
+    """
+    Liest CSV/Excel blockweise und liefert bereinigte DataFrames mit je max. 'chunksize' Zeilen.
+    CSV: pandas chunksize | Excel: openpyxl im read-only Modus (Zeile für Zeile).
+    """
+    if file_path.lower().endswith(('.xlsx', '.xlsm')):
+        yield from _iter_excel_chunks(file_path, chunksize)
+    elif file_path.lower().endswith('.xls'):
+        # Altes Binärformat kann openpyxl nicht streamen -> einmal komplett lesen
+        df = pd.read_excel(file_path, dtype=str)
+        for start in range(0, len(df), chunksize):
+            yield _clean_chunk(df.iloc[start:start + chunksize].copy(), drop_empty_names=False)
+    else:
+        yield from _iter_csv_chunks(file_path, chunksize)
+
+
+def prefetch(iterable, depth=1):
+    """
+    Holt die nächsten 'depth' Elemente in einem Hintergrund-Thread.
+    So wird Block N+1 schon geparst, während Block N angereichert wird.
+    """
+    import queue
+    import threading
+
+    q = queue.Queue(maxsize=depth)
+    done = object()
+    stopped = threading.Event()
+
+    def put(item):
+        # Nicht ewig blockieren, falls der Verbraucher abgebrochen hat
+        while not stopped.is_set():
+            try:
+                q.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def producer():
+        try:
+            for item in iterable:
+                if not put(item): return
+        except Exception as e:
+            put(e)
+        put(done)
+
+    threading.Thread(target=producer, daemon=True).start()
+    try:
+        while True:
+            item = q.get()
+            if item is done: return
+            if isinstance(item, Exception): raise item
+            yield item
+    finally:
+        stopped.set()
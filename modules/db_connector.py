@@ -1,13 +1,92 @@
 import os
+import time
+import sqlite3
+import hashlib
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import mysql.connector
+from mysql.connector import pooling
 from dotenv import load_dotenv
+from .config import (
+    DB_UPLOAD_BATCH_ROWS, DB_UPLOAD_BATCH_MB, DB_UPLOAD_DIFF, DB_UPLOAD_WORKERS, DB_UPLOAD_SHARD_ROWS,
+    DB_POOL_SIZE, DB_POOL_TIMEOUT
+)
 
 # .env laden
 load_dotenv()
 
+# Artikelnummern pro executemany-Paket beim Hash-Abgleich (nur kurze Schlüssel)
+KEY_BATCH_ROWS = 5000
+
+# Deadlock / Lock-Wait-Timeout: Der Shard wird komplett wiederholt
+RETRY_ERRNOS = {1205, 1213}
+SHARD_ATTEMPTS = 3
+
+# Alle Fehler, die ein Upload werfen kann ("sqlite" = lokaler Ersatz für benchmark_upload.py)
+DB_ERRORS = (mysql.connector.Error, sqlite3.Error)
+
+# SQL, das sich zwischen den Dialekten unterscheidet. Der Rest ist Standard-SQL mit %s-Platzhaltern.
+SQL = {
+    "mysql": {
+        # Gleicher Spaltentyp + Kollation wie tartikel -> der JOIN nutzt den Index auf cArtNr
+        "create_tmp_desc": "CREATE TEMPORARY TABLE tmp_beschreibung (PRIMARY KEY (cArtNr)) "
+                           "SELECT cArtNr, cBeschreibung FROM tartikel LIMIT 0",
+        "create_tmp_keys": "CREATE TEMPORARY TABLE tmp_artnr (PRIMARY KEY (cArtNr)) SELECT cArtNr FROM tartikel LIMIT 0",
+        "drop_tmp_desc": "DROP TEMPORARY TABLE tmp_beschreibung",
+        "drop_tmp_keys": "DROP TEMPORARY TABLE tmp_artnr",
+        # Nur Artikel, deren Text sich wirklich (byte-genau) unterscheidet, werden geschrieben
+        "changed": "NOT (CAST(a.cBeschreibung AS BINARY) <=> CAST(t.cBeschreibung AS BINARY))",
+        "update_join": "UPDATE tartikel a JOIN tmp_beschreibung t ON a.cArtNr = t.cArtNr "
+                       "SET a.cBeschreibung = t.cBeschreibung WHERE {changed}",
+        # CONVERT -> Hash über UTF-8-Bytes, unabhängig vom Zeichensatz der Spalte (wie der lokale Hash)
+        "remote_hashes": "SELECT k.cArtNr, MD5(CONVERT(a.cBeschreibung USING utf8mb4)) "
+                         "FROM tmp_artnr k JOIN tartikel a ON a.cArtNr = k.cArtNr",
+    },
+    "sqlite": {
+        "create_tmp_desc": "CREATE TEMP TABLE tmp_beschreibung (cArtNr TEXT COLLATE NOCASE PRIMARY KEY, cBeschreibung TEXT)",
+        "create_tmp_keys": "CREATE TEMP TABLE tmp_artnr (cArtNr TEXT COLLATE NOCASE PRIMARY KEY)",
+        "drop_tmp_desc": "DROP TABLE temp.tmp_beschreibung",
+        "drop_tmp_keys": "DROP TABLE temp.tmp_artnr",
+        "changed": "a.cBeschreibung IS NOT t.cBeschreibung",
+        "update_join": "UPDATE tartikel AS a SET cBeschreibung = t.cBeschreibung "
+                       "FROM tmp_beschreibung t WHERE a.cArtNr = t.cArtNr AND {changed}",
+        # MD5() registriert die Verbindungs-Fabrik (siehe benchmark_upload.py)
+        "remote_hashes": "SELECT k.cArtNr, MD5(a.cBeschreibung) FROM tmp_artnr k JOIN tartikel a ON a.cArtNr = k.cArtNr",
+    },
+}
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(config, size=DB_POOL_SIZE):
+    """
+    Prozessweit geteilter Verbindungs-Pool je Zugangsdaten (app.py erzeugt pro Klick einen neuen DBConnector).
+    Beim Ausleihen prüft der Pool die Verbindung (Ping) und verbindet tote Verbindungen neu,
+    beim Zurückgeben wird die Session zurückgesetzt (Temp-Tabellen, offene Transaktionen).
+    """
+    key = (config.get('host'), config.get('port'), config.get('user'), config.get('database'))
+    with _pools_lock:
+        if key not in _pools:
+            _pools[key] = pooling.MySQLConnectionPool(
+                pool_name=f"marvin_{len(_pools) + 1}",
+                pool_size=max(1, min(size, pooling.CNX_POOL_MAXSIZE)),
+                pool_reset_session=True,
+                **config
+            )
+        return _pools[key]
+
 class DBConnector:
-    def __init__(self, html_folder="output_HTML"):
+    def __init__(self, html_folder="output_HTML", connection_factory=None, dialect="mysql"):
+        """
+        Standard: Live-DB aus der .env über den Verbindungs-Pool.
+        connection_factory + dialect: eigene Verbindungen (z.B. SQLite-Ersatz für Benchmarks), ohne Pool.
+        """
         self.html_folder = html_folder
+        self.connection_factory = connection_factory
+        self.dialect = dialect
+        self.sql = SQL[dialect]
         self.config = {
             'user': os.getenv('DB_USER'),
             'password': os.getenv('DB_PASSWORD'),
@@ -17,11 +96,38 @@ class DBConnector:
         }
 
     def connect(self):
+        """ Verbindung aus dem Pool. close() gibt sie an den Pool zurück. """
         try:
-            return mysql.connector.connect(**self.config)
-        except mysql.connector.Error as err:
+            return self._acquire()
+        except DB_ERRORS as err:
             return None, f"Verbindungsfehler: {err}"
 
+    def _acquire(self):
+        if self.connection_factory:
+            return self.connection_factory()
+        pool = get_pool(self.config)
+        deadline = time.monotonic() + DB_POOL_TIMEOUT
+        while True:
+            try:
+                return pool.get_connection()
+            except pooling.PoolError:
+                # Alle Verbindungen in Benutzung -> kurz warten statt sofort abzubrechen
+                if time.monotonic() > deadline: raise
+                time.sleep(0.05)
+
+    @contextmanager
+    def pooled_connection(self):
+        """ Verbindung für einen Arbeitsschritt. Bei Fehlern wird zurückgerollt, danach geht sie an den Pool zurück. """
+        conn = self._acquire()
+        try:
+            yield conn
+        except Exception:
+            try: conn.rollback()
+            except DB_ERRORS: pass
+            raise
+        finally:
+            conn.close()
+
     # --- EINZEL IMPORT ---
     def export_single_article(self, art_nr):
         """ Exportiert EINE HTML-Datei in die Datenbank. """
@@ -40,9 +146,14 @@ class DBConnector:
         return self._write_to_db(art_nr, html_content)
 
     # --- MASSEN IMPORT ---
-    def export_all_articles(self, callback_log=None):
+    def export_all_articles(self, callback_log=None, diff=DB_UPLOAD_DIFF, workers=DB_UPLOAD_WORKERS):
         """ 
         Exportiert ALLE HTML-Dateien aus dem Ordner.
+        Die Artikel werden in Shards aufgeteilt, bis zu 'workers' Threads laden parallel hoch
+        (jeder Shard mit eigener Pool-Verbindung und eigener Transaktion).
+        Mit diff=True wird vorher der MD5 jeder Beschreibung in der DB abgefragt, gesendet werden nur geänderte Artikel.
+        Set-basiert: (cArtNr, cBeschreibung) per executemany in eine Temp-Tabelle,
+        danach EIN UPDATE ... JOIN. Gezählt wird über Mengen-Abfragen statt mit einem SELECT pro Artikel.
         """
         if not os.path.exists(self.html_folder):
             return "❌ Ordner 'output_HTML' nicht gefunden!"
@@ -53,83 +164,199 @@ class DBConnector:
             return "⚠️ Keine HTML-Dateien zum Importieren gefunden."
 
         if callback_log: callback_log(f"🔄 Starte Massen-Update für {len(files)} Artikel...")
-        
-        conn = None
-        try:
-            conn = mysql.connector.connect(**self.config)
-            cursor = conn.cursor()
-            
-            success_count = 0
-            skipped_count = 0
-            error_count = 0
-            
-            for i, filename in enumerate(files):
+
+        rows, error_count = self._read_html_files(files, callback_log)
+        # Sortiert -> jeder Shard trifft einen zusammenhängenden Bereich des cArtNr-Index
+        rows.sort()
+        shards = [rows[start:start + DB_UPLOAD_SHARD_ROWS] for start in range(0, len(rows), DB_UPLOAD_SHARD_ROWS)]
+
+        # Alle Threads melden über dasselbe callback_log, Zeilen dürfen sich nicht vermischen
+        log_lock = threading.Lock()
+        def log(msg):
+            if callback_log:
+                with log_lock: callback_log(msg)
+
+        totals = {"updated": 0, "identical": 0}
+        failures = []
+        with ThreadPoolExecutor(max_workers=max(1, min(workers, len(shards) or 1))) as executor:
+            futures = {executor.submit(self._upload_shard, shard, diff): shard for shard in shards}
+            for done_count, future in enumerate(as_completed(futures), start=1):
+                shard = futures[future]
                 try:
-                    art_nr = os.path.splitext(filename)[0]
-                    file_path = os.path.join(self.html_folder, filename)
-                    
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        html_content = f.read()
-                    
-                    # 1. Update versuchen
-                    update_query = "UPDATE tartikel SET cBeschreibung = %s WHERE cArtNr = %s"
-                    cursor.execute(update_query, (html_content, art_nr))
-                    
-                    if cursor.rowcount > 0:
-                        # Fall A: Daten wurden geändert
-                        success_count += 1
-                        if callback_log: callback_log(f"  ✅ {art_nr}: Updated")
-                    else:
-                        # Fall B: Keine Änderung (0 Zeilen). Warum?
-                        # Checken ob Artikel überhaupt existiert
-                        cursor.execute("SELECT cArtNr FROM tartikel WHERE cArtNr = %s", (art_nr,))
-                        if cursor.fetchone():
-                            # Artikel da -> Daten waren identisch
-                            skipped_count += 1
-                            if callback_log: callback_log(f"  ℹ️ {art_nr}: Bereits aktuell (Daten identisch)")
-                        else:
-                            # Artikel NICHT da -> Fehler
-                            error_count += 1
-                            if callback_log: callback_log(f"  ⚠️ {art_nr}: Artikelnummer nicht in DB gefunden!")
-                    
-                    if i % 10 == 0:
+                    result = future.result()
+                except DB_ERRORS as err:
+                    failures.append(err)
+                    error_count += len(shard)
+                    log(f"❌ Shard {done_count}/{len(shards)} ({shard[0][0]} – {shard[-1][0]}, {len(shard)} Artikel) fehlgeschlagen: {err}")
+                    continue
+
+                totals["updated"] += result["updated"]
+                totals["identical"] += result["identical"]
+                error_count += len(result["missing"])
+                for art_nr in result["missing"]:
+                    log(f"  ⚠️ {art_nr}: Artikelnummer nicht in DB gefunden!")
+                log(
+                    f"📦 Shard {done_count}/{len(shards)}: {result['updated']} geändert | "
+                    f"{result['identical']} unverändert | {len(result['missing'])} nicht in DB"
+                )
+
+        if shards and len(failures) == len(shards):
+            return f"❌ Datenbank-Fehler: {failures[0]}"
+        return f"🏁 Fertig! Updated: {totals['updated']} | Identisch: {totals['identical']} | Nicht gefunden/Fehler: {error_count}"
+
+    def _upload_shard(self, rows, diff=DB_UPLOAD_DIFF):
+        """
+        Lädt einen Shard in EINER Transaktion hoch (Abgleich + Temp-Tabelle + UPDATE ... JOIN).
+        Bei Deadlock/Lock-Timeout wird der Shard wiederholt. Gibt {"updated", "identical", "missing"} zurück.
+        """
+        for attempt in range(1, SHARD_ATTEMPTS + 1):
+            try:
+                with self.pooled_connection() as conn:
+                    unchanged, missing = 0, []
+                    todo = rows
+                    if diff:
+                        todo, unchanged, missing = self._diff_against_db(conn, rows)
+
+                    result = {"updated": 0, "identical": 0, "missing": []}
+                    if todo:
+                        cursor = conn.cursor()
+                        result = self._bulk_update(cursor, todo)
                         conn.commit()
+                        cursor.close()
+                return {
+                    "updated": result["updated"],
+                    "identical": unchanged + result["identical"],
+                    "missing": missing + result["missing"],
+                }
+            except DB_ERRORS as err:
+                if getattr(err, "errno", None) not in RETRY_ERRNOS or attempt == SHARD_ATTEMPTS: raise
+                time.sleep(0.2 * attempt)
+
+    def _read_html_files(self, files, callback_log=None):
+        """ Liest die HTML-Dateien als (cArtNr, Inhalt). Gibt (Zeilen, Anzahl Lesefehler) zurück. """
+        rows = []
+        seen = set()
+        error_count = 0
+        for filename in files:
+            art_nr = os.path.splitext(filename)[0]
+            # Die Spalte vergleicht ohne Groß-/Kleinschreibung -> "a1.html" und "A1.html" sind derselbe Artikel
+            if art_nr.strip().lower() in seen: continue
+            try:
+                with open(os.path.join(self.html_folder, filename), 'r', encoding='utf-8') as f:
+                    rows.append((art_nr, f.read()))
+                seen.add(art_nr.strip().lower())
+            except Exception as e:
+                error_count += 1
+                if callback_log: callback_log(f"  ❌ Fehler bei {filename}: {e}")
+        return rows, error_count
+
+    def _q(self, query):
+        """ %s-Platzhalter in den Stil des Dialekts übersetzen (sqlite3: ?). """
+        return query if self.dialect == "mysql" else query.replace("%s", "?")
 
-                except Exception as e:
-                    error_count += 1
-                    if callback_log: callback_log(f"  ❌ Fehler bei {filename}: {e}")
+    @staticmethod
+    def _iter_batches(rows):
+        """ Pakete für executemany: höchstens DB_UPLOAD_BATCH_ROWS Zeilen bzw. DB_UPLOAD_BATCH_MB. """
+        max_bytes = DB_UPLOAD_BATCH_MB * 1024 * 1024
+        batch, batch_bytes = [], 0
+        for art_nr, content in rows:
+            batch.append((art_nr, content))
+            batch_bytes += len(content)
+            if len(batch) >= DB_UPLOAD_BATCH_ROWS or batch_bytes >= max_bytes:
+                yield batch
+                batch, batch_bytes = [], 0
+        if batch:
+            yield batch
+
+    def _fetch_remote_hashes(self, conn, art_nrs):
+        """
+        MD5 der aktuellen cBeschreibung für alle übergebenen Artikelnummern, in EINER gestreamten Abfrage.
+        Gibt {cArtNr: {md5, ...}} zurück (mehrere Werte, falls die ArtNr mehrfach in tartikel steht).
+        Artikelnummern, die fehlen, sind nicht in der DB.
+        """
+        cursor = conn.cursor()
+        cursor.execute(self.sql["create_tmp_keys"])
+        try:
+            for start in range(0, len(art_nrs), KEY_BATCH_ROWS):
+                cursor.executemany(
+                    self._q("INSERT INTO tmp_artnr (cArtNr) VALUES (%s)"),
+                    [(art_nr,) for art_nr in art_nrs[start:start + KEY_BATCH_ROWS]]
+                )
 
-            conn.commit()
+            # Ungepufferter Cursor: Die Hashes kommen zeilenweise, statt erst komplett im Speicher zu landen
+            stream = conn.cursor(buffered=False) if self.dialect == "mysql" else conn.cursor()
+            stream.execute(self.sql["remote_hashes"])
+            remote = {}
+            for art_nr, digest in stream:
+                remote.setdefault(art_nr, set()).add(digest)
+            stream.close()
+        finally:
+            cursor.execute(self.sql["drop_tmp_keys"])
             cursor.close()
-            return f"🏁 Fertig! Updated: {success_count} | Identisch: {skipped_count} | Nicht gefunden/Fehler: {error_count}"
+        return remote
+
+    def _diff_against_db(self, conn, rows):
+        """ Teilt die Zeilen in geändert / unverändert / nicht in DB. Gibt (geänderte Zeilen, Anzahl unverändert, fehlende ArtNr) zurück. """
+        remote = self._fetch_remote_hashes(conn, [art_nr for art_nr, _ in rows])
+        changed, missing = [], []
+        unchanged = 0
+        for art_nr, content in rows:
+            digests = remote.get(art_nr)
+            if digests is None:
+                missing.append(art_nr)
+            elif digests == {hashlib.md5(content.encode('utf-8')).hexdigest()}:
+                unchanged += 1
+            else:
+                changed.append((art_nr, content))
+        return changed, unchanged, missing
 
-        except mysql.connector.Error as err:
-            return f"❌ Datenbank-Fehler: {err}"
+    def _bulk_update(self, cursor, rows):
+        """
+        Schreibt alle Zeilen in einer Transaktion (Commit macht der Aufrufer).
+        Gibt {"updated": n, "identical": n, "missing": [cArtNr, ...]} zurück.
+        """
+        cursor.execute(self.sql["create_tmp_desc"])
+        try:
+            for batch in self._iter_batches(rows):
+                cursor.executemany(self._q("INSERT INTO tmp_beschreibung (cArtNr, cBeschreibung) VALUES (%s, %s)"), batch)
+
+            cursor.execute(
+                "SELECT t.cArtNr FROM tmp_beschreibung t "
+                "LEFT JOIN tartikel a ON a.cArtNr = t.cArtNr WHERE a.cArtNr IS NULL"
+            )
+            missing = [row[0] for row in cursor.fetchall()]
+
+            changed = self.sql["changed"]
+            cursor.execute(
+                f"SELECT COUNT(DISTINCT t.cArtNr) FROM tmp_beschreibung t "
+                f"JOIN tartikel a ON a.cArtNr = t.cArtNr WHERE {changed}"
+            )
+            updated = cursor.fetchone()[0]
+            cursor.execute(self.sql["update_join"].format(changed=changed))
         finally:
-            if conn and conn.is_connected():
-                conn.close()
+            cursor.execute(self.sql["drop_tmp_desc"])
+
+        return {"updated": updated, "identical": len(rows) - updated - len(missing), "missing": missing}
 
     # Interne Hilfsfunktion für Einzel-Update
     def _write_to_db(self, art_nr, content):
-        conn = None
         try:
-            conn = mysql.connector.connect(**self.config)
-            cursor = conn.cursor()
-            
-            # 1. Update
-            update_query = "UPDATE tartikel SET cBeschreibung = %s WHERE cArtNr = %s"
-            cursor.execute(update_query, (content, art_nr))
-            rows = cursor.rowcount
-            
-            conn.commit()
-            
-            if rows > 0:
-                msg = f"✅ Artikel '{art_nr}' erfolgreich aktualisiert."
-                cursor.close()
-                return True, msg
-            else:
+            with self.pooled_connection() as conn:
+                cursor = conn.cursor()
+                
+                # 1. Update
+                update_query = self._q("UPDATE tartikel SET cBeschreibung = %s WHERE cArtNr = %s")
+                cursor.execute(update_query, (content, art_nr))
+                rows = cursor.rowcount
+                
+                conn.commit()
+                
+                if rows > 0:
+                    cursor.close()
+                    return True, f"✅ Artikel '{art_nr}' erfolgreich aktualisiert."
+
                 # 2. Detail-Check: Existiert er?
-                cursor.execute("SELECT cArtNr FROM tartikel WHERE cArtNr = %s", (art_nr,))
+                cursor.execute(self._q("SELECT cArtNr FROM tartikel WHERE cArtNr = %s"), (art_nr,))
                 result = cursor.fetchone()
                 cursor.close()
                 
@@ -138,8 +365,5 @@ class DBConnector:
                 else:
                     return False, f"⚠️ Artikel '{art_nr}' wurde nicht in der Datenbank gefunden!"
 
-        except mysql.connector.Error as err:
+        except DB_ERRORS as err:
             return False, f"SQL Fehler: {err}"
-        finally:
-            if conn and conn.is_connected():
-                conn.close()
\ No newline at end of file
@@ -0,0 +1,140 @@
+import os
+import re
+import json
+import threading
+from .config import OUTPUT_FOLDER
+
+
+def normalize_gtin(gtin):
+    """ Nur Ziffern, führende Nullen weg (EAN-13 mit 0 vorne == UPC-12). Zu kurz -> ''. """
+    digits = re.sub(r'\D', '', str(gtin))
+    return digits.lstrip('0') if len(digits) >= 8 else ''
+
+
+def normalize_name(name):
+    """ Kleinschreibung, Sonderzeichen/Mehrfach-Leerzeichen zusammengefasst. """
+    return re.sub(r'[^a-z0-9äöüß]+', ' ', str(name).lower()).strip()
+
+
+def group_key(name, gtin):
+    """ Gleiche GTIN -> gleicher Artikel. Ohne GTIN entscheidet der normalisierte Name. """
+    gtin_key = normalize_gtin(gtin)
+    if gtin_key: return f"gtin:{gtin_key}"
+    name_key = normalize_name(name)
+    return f"name:{name_key}" if name_key else None
+
+
+class DedupePlan:
+    """
+    Globale Planung über ALLE Eingabedateien (Root + Kategorie-Ordner).
+    Zeilen mit gleicher GTIN (bzw. gleichem Namen ohne GTIN) bilden eine Gruppe.
+    Pro Gruppe wird nur EIN Mitglied angereichert ("Leader"), alle anderen
+    Artikelnummern bekommen eine Kopie der JSON mit ihren eigenen Stammdaten.
+    """
+
+    def __init__(self, output_folder=OUTPUT_FOLDER):
+        self.output_folder = output_folder
+        self._members = {}     # group_key -> [job_key, ...] in Verarbeitungs-Reihenfolge
+        self._group_of = {}    # job_key -> group_key
+        self._info = {}        # job_key -> (art_nr, gtin, name)
+        self._source = {}      # group_key -> job_key mit fertiger JSON
+        self._released = set() # Leader, deren Anreicherung fehlgeschlagen ist
+        self._waiting = {}     # group_key -> {job_key, ...} die auf das Ergebnis des Leaders warten
+        self._lock = threading.Lock()
+        self.copies = 0
+
+    # --- Planung ---
+    def add(self, prep):
+        """ prep: Ergebnis von main.prepare_articles. Offene ('') und fertige ('done') Zeilen zählen. """
+        rows = zip(prep['safe_filename'], prep['art_nr'], prep['gtin'], prep['name'], prep['skip_reason'])
+        for job_key, art_nr, gtin, name, reason in rows:
+            if reason not in ('', 'done') or job_key in self._group_of: continue
+            key = group_key(name, gtin)
+            if not key: continue
+            self._group_of[job_key] = key
+            self._info[job_key] = (art_nr, gtin, name)
+            self._members.setdefault(key, []).append(job_key)
+            if reason == 'done': self._source.setdefault(key, job_key)
+
+    def stats(self):
+        groups = [members for members in self._members.values() if len(members) > 1]
+        return {
+            "groups": len(groups),
+            "duplicates": sum(len(members) - 1 for members in groups),
+            "copies": self.copies,
+        }
+
+    # --- Ausführung ---
+    def claim(self, job_key):
+        """
+        "lead": Artikel selbst anreichern | "copy": JSON eines Gruppen-Mitglieds liegt schon vor
+        "wait": ein anderes Mitglied wird gerade angereichert und verteilt sein Ergebnis.
+        """
+        with self._lock:
+            key = self._group_of.get(job_key)
+            if key is None or len(self._members[key]) == 1:
+                return "lead"
+            waiting = self._waiting.setdefault(key, set())
+            waiting.discard(job_key)
+            source = self._source.get(key)
+            if source and source != job_key:
+                return "copy"
+            leader = next((m for m in self._members[key] if m not in self._released), job_key)
+            if leader == job_key:
+                return "lead"
+            waiting.add(job_key)
+            return "wait"
+
+    def release(self, job_key):
+        """
+        Leader ist fehlgeschlagen -> das nächste Mitglied der Gruppe darf selbst anreichern.
+        Gibt die Mitglieder zurück, die auf ihn gewartet haben (müssen neu eingeplant werden).
+        """
+        with self._lock:
+            self._released.add(job_key)
+            return sorted(self._waiting.pop(self._group_of.get(job_key), ()))
+
+    def copy_from_source(self, job_key):
+        """ Kopiert die vorhandene JSON der Gruppe auf diesen Artikel. Gibt die geschriebene Kopie zurück (None bei Fehler). """
+        with self._lock:
+            source = self._source.get(self._group_of.get(job_key))
+        if not source:
+            return None
+        try:
+            with open(os.path.join(self.output_folder, f"{source}.json"), 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return self._write_copy(job_key, data)
+
+    def fan_out(self, job_key, data):
+        """
+        Verteilt das Ergebnis des Leaders auf alle noch offenen Gruppen-Mitglieder.
+        Gibt die Liste der geschriebenen Job-Schlüssel zurück.
+        """
+        with self._lock:
+            key = self._group_of.get(job_key)
+            if key is None:
+                return []
+            self._source.setdefault(key, job_key)
+            self._waiting.pop(key, None)
+            targets = [m for m in self._members[key] if m != job_key]
+
+        written = []
+        for member in targets:
+            if os.path.exists(os.path.join(self.output_folder, f"{member}.json")): continue
+            self._write_copy(member, data)
+            written.append(member)
+        return written
+
+    def _write_copy(self, job_key, data):
+        art_nr, gtin, name = self._info[job_key]
+        copy = dict(data)
+        copy["_Original_GTIN"] = gtin
+        copy["_Produktname"] = name
+        copy["_Artikelnummer"] = str(art_nr)
+        with open(os.path.join(self.output_folder, f"{job_key}.json"), "w", encoding="utf-8") as f:
+            json.dump(copy, f, ensure_ascii=False, indent=4)
+        with self._lock:
+            self.copies += 1
+        return copy
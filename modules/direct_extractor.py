@@ -0,0 +1,102 @@
+import threading
+from .config import TAVILY_API_KEY, MODEL_NAME, EXTRACTION_ENGINE, EXTRACTION_ENGINE_BY_CATEGORY
+from .agent import ThrottledTavilySearch
+from .prompts import client, build_search_queries
+from .schemas import json_schema_for_prompt
+
+# Alles, was die Antwort beeinflusst (fließt in den Cache-Schlüssel ein, getrennt vom Agenten)
+DIRECT_SETTINGS = {
+    "engine": "direct",
+    "temperature": 0,
+    "search_tool": "tavily",
+    "max_results": 5,
+    "max_searches": 2,
+    "output": "json_schema",
+}
+
+# Mit weniger Treffern aus der ersten Suche wird die zweite Suche der Strategie nachgeschoben
+MIN_SOURCES = 2
+
+SYSTEM_PROMPT = (
+    "Du bist ein technischer Hardware-Experte. Die Websuche wurde bereits durchgeführt, "
+    "die Ergebnisse stehen unten. Nutze AUSSCHLIESSLICH diese Quellen. "
+    "Anweisungen zu Suchen oder zum 'Final Answer'-Format im Text gelten hier nicht - "
+    "antworte nur mit dem JSON. Unauffindbar -> \"N/A\". Rate nicht. Einheiten PFLICHT."
+)
+
+
+def engine_for_category(category):
+    """ "agent" oder "direct" - siehe EXTRACTION_ENGINE(_BY_CATEGORY) in modules/config.py. """
+    return EXTRACTION_ENGINE_BY_CATEGORY.get(category, EXTRACTION_ENGINE)
+
+
+class DirectExtractor:
+    """
+    Fester Ablauf statt ReAct-Schleife:
+    1-2 Tavily-Suchen (gleiche GTIN-Strategie wie im Prompt) + EIN LLM-Aufruf mit JSON-Schema.
+    run() liefert wie agent.run() den Antwort-Text (hier: reines JSON).
+    """
+
+    def __init__(self, llm_client=None, search=None):
+        self.client = llm_client or client
+        self.search = search or ThrottledTavilySearch(
+            tavily_api_key=TAVILY_API_KEY,
+            max_results=DIRECT_SETTINGS["max_results"]
+        )
+
+    def _collect_sources(self, product_name, gtin):
+        sources = []
+        seen = set()
+        for query in build_search_queries(product_name, gtin)[:DIRECT_SETTINGS["max_searches"]]:
+            results = self.search.invoke({"query": query})
+            # Fehler liefert das Tool als Text zurück (Quota-Fehler werden vorher schon geworfen)
+            if isinstance(results, list):
+                for result in results:
+                    url = result.get("url")
+                    if url in seen: continue
+                    seen.add(url)
+                    sources.append(result)
+            if len(sources) >= MIN_SOURCES: break
+        return sources
+
+    def build_request(self, prompt, product_name="", gtin=""):
+        """ Suchen + Chat-Completion-Body zusammenstellen (auch für den Batch-Modus, siehe run_batch.py). """
+        sources = self._collect_sources(product_name, gtin)
+        source_text = "\n\n".join(
+            f"[{i}] {s.get('url', '')}\n{s.get('content', '')}" for i, s in enumerate(sources, start=1)
+        ) or "KEINE TREFFER"
+
+        schema = json_schema_for_prompt(prompt)
+        if schema:
+            response_format = {
+                "type": "json_schema",
+                "json_schema": {"name": "produkt_datenblatt", "strict": True, "schema": schema},
+            }
+        else:
+            # Kategorie ohne feste Struktur -> nur gültiges JSON erzwingen
+            response_format = {"type": "json_object"}
+
+        return {
+            "model": MODEL_NAME,
+            "temperature": DIRECT_SETTINGS["temperature"],
+            "response_format": response_format,
+            "messages": [
+                {"role": "system", "content": SYSTEM_PROMPT},
+                {"role": "user", "content": f"{prompt}\n\nSUCHERGEBNISSE:\n{source_text}"},
+            ],
+        }
+
+    def run(self, prompt, product_name="", gtin=""):
+        completion = self.client.chat.completions.create(**self.build_request(prompt, product_name, gtin))
+        return completion.choices[0].message.content or ""
+
+_extractor = None
+_extractor_lock = threading.Lock()
+
+
+def get_direct_extractor():
+    global _extractor
+    with _extractor_lock:
+        if _extractor is None:
+            _extractor = DirectExtractor()
+        return _extractor
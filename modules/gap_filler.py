@@ -0,0 +1,176 @@
+import json
+import threading
+from .config import TAVILY_API_KEY, MODEL_NAME
+from .agent import ThrottledTavilySearch
+from .prompts import client
+from .schemas import schema_for_category, template_to_json_schema, is_filled
+
+# Alles, was die Antwort beeinflusst (fließt in den Cache-Schlüssel ein)
+GAP_FILL_SETTINGS = {
+    "engine": "gap_fill",
+    "temperature": 0,
+    "search_tool": "tavily",
+    "max_results": 5,
+    "output": "json_schema",
+}
+
+# Pro Nachfrage höchstens so viele Felder (Pflichtfelder zuerst)
+MAX_GAP_FIELDS = 25
+
+
+def _leaf_paths(node, path=()):
+    for key, value in node.items():
+        if key.startswith("_"): continue
+        if isinstance(value, dict):
+            yield from _leaf_paths(value, path + (key,))
+        else:
+            yield path + (key,), value
+
+
+def _locate(data, path):
+    """ Gruppe + Feldname, in der das Feld in der JSON tatsächlich steht (ggf. in einer anderen Gruppe). """
+    node = data
+    for key in path[:-1]:
+        node = node.get(key) if isinstance(node, dict) else None
+        if node is None: break
+    if isinstance(node, dict) and path[-1] in node:
+        return node
+    for group in data.values():
+        if isinstance(group, dict) and path[-1] in group:
+            return group
+    return None
+
+
+def find_gaps(data, category=None):
+    """
+    Liste der fehlenden Felder als (Pfad, Hinweis). Mit Kategorie-Schema: alle Schema-Felder ohne Wert,
+    Pflichtfelder zuerst. Ohne Schema: alle Felder der JSON, die auf "N/A" o.ä. stehen.
+    """
+    schema = schema_for_category(category) if category else None
+    if schema:
+        report = schema.validate(data)
+        missing = [tuple(name.split(" > ")) for name, ok in report["fields"].items() if not ok]
+        required = {path for path, is_required in schema.fields if is_required}
+        missing.sort(key=lambda path: path not in required)
+        return [(path, schema.hint(path)) for path in missing][:MAX_GAP_FIELDS]
+
+    return [(path, "") for path, value in _leaf_paths(data) if not is_filled(value)][:MAX_GAP_FIELDS]
+
+
+def build_gap_prompt(data, gaps, product_name, gtin):
+    known = {" > ".join(path): value for path, value in _leaf_paths(data) if is_filled(value)}
+    known_text = json.dumps(known, ensure_ascii=False)[:2000]
+    wanted = "\n".join(f"- {' > '.join(path)}" + (f" ({hint})" if hint else "") for path, hint in gaps)
+    return f"""
+    Du bist ein technischer Hardware-Experte.
+    Produkt: {product_name}
+    GTIN: {gtin if gtin else "NICHT VORHANDEN"}
+
+    Bereits bekannt (nur zur Orientierung, NICHT ändern):
+    {known_text}
+
+    Ergänze AUSSCHLIESSLICH diese fehlenden Felder:
+    {wanted}
+
+    REGELN:
+    1. Nutze nur die Suchergebnisse. Unauffindbar -> "N/A".
+    2. Rate nicht.
+    3. Einheiten PFLICHT (3.5 GHz).
+    """
+
+
+def merge_gaps(data, answer, gaps):
+    """ Übernimmt gefundene Werte in die JSON. Gibt die Liste der gefüllten Felder zurück. """
+    filled = []
+    for path, _ in gaps:
+        value = answer
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+        if not is_filled(value): continue
+
+        target = _locate(data, path)
+        if target is None:
+            target = data
+            for key in path[:-1]:
+                if not isinstance(target.get(key), dict): target[key] = {}
+                target = target[key]
+        target[path[-1]] = value
+        filled.append(" > ".join(path))
+    return filled
+
+
+class GapFiller:
+    """
+    Gezielte Nachfrage statt kompletter Neu-Anreicherung:
+    EINE Suche nach den fehlenden Feldern + EIN LLM-Aufruf, der nur diese Felder (per JSON-Schema) liefert.
+    run() liefert wie agent.run() den Antwort-Text.
+    """
+
+    def __init__(self, llm_client=None, search=None):
+        self.client = llm_client or client
+        self.search = search or ThrottledTavilySearch(
+            tavily_api_key=TAVILY_API_KEY,
+            max_results=GAP_FILL_SETTINGS["max_results"]
+        )
+
+    def run(self, prompt, query="", schema=None):
+        results = self.search.invoke({"query": query}) if query else []
+        sources = results if isinstance(results, list) else []
+        source_text = "\n\n".join(
+            f"[{i}] {s.get('url', '')}\n{s.get('content', '')}" for i, s in enumerate(sources, start=1)
+        ) or "KEINE TREFFER"
+
+        completion = self.client.chat.completions.create(
+            model=MODEL_NAME,
+            temperature=GAP_FILL_SETTINGS["temperature"],
+            response_format={
+                "type": "json_schema",
+                "json_schema": {"name": "fehlende_felder", "strict": True, "schema": schema},
+            },
+            messages=[{"role": "user", "content": f"{prompt}\n\nSUCHERGEBNISSE:\n{source_text}"}],
+        )
+        return completion.choices[0].message.content or ""
+
+
+def fill_gaps(data, category, product_name, gtin, runner, filler=None):
+    """
+    Füllt die Lücken einer vorhandenen JSON. runner(filler, prompt, **kwargs) führt die Anfrage aus
+    (z.B. über den Response-Cache). Gibt die Liste der gefüllten Felder zurück, data wird direkt ergänzt.
+    """
+    gaps = find_gaps(data, category)
+    if not gaps:
+        return []
+
+    template = {}
+    for path, hint in gaps:
+        node = template
+        for key in path[:-1]:
+            node = node.setdefault(key, {})
+        node[path[-1]] = hint or "Wert mit Einheit oder N/A"
+
+    field_names = list(dict.fromkeys(path[-1] for path, _ in gaps))[:6]
+    query = " ".join([product_name, gtin or ""] + field_names + ["Datenblatt"]).replace("  ", " ")
+
+    response_text = runner(
+        filler or get_gap_filler(),
+        build_gap_prompt(data, gaps, product_name, gtin),
+        query=query,
+        schema=template_to_json_schema(template, with_product_name=False),
+    )
+    try:
+        answer = json.loads(response_text)
+    except ValueError:
+        return []
+    return merge_gaps(data, answer, gaps)
+
+
+_filler = None
+_filler_lock = threading.Lock()
+
+
+def get_gap_filler():
+    global _filler
+    with _filler_lock:
+        if _filler is None:
+            _filler = GapFiller()
+        return _filler
@@ -7,6 +7,7 @@ class HTMLGenerator:
     def __init__(self, json_folder, output_folder, template_path="templates/template.html"):
         self.json_folder = json_folder
         self.output_folder = output_folder
+        self.template_path = template_path
         self.template_dir = os.path.dirname(template_path)
         self.template_name = os.path.basename(template_path)
         
@@ -1482,13 +1483,11 @@ class HTMLGenerator:
         html += '</div>'
         return html
 
-    def generate_single(self, json_file):
-        """ Liest eine JSON, wählt den richtigen Generator und speichert das HTML. """
-        json_path = os.path.join(self.json_folder, json_file)
-        
-        with open(json_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-
+    def render(self, data):
+        """
+        Wählt den richtigen Generator und rendert das Datenblatt komplett im Speicher.
+        Gibt (fertiges HTML, Technik-Block) zurück - ohne Datei-Zugriffe.
+        """
         # --- INTELLIGENTE WEICHE 🛡️ ---
         is_ram = False
         is_case = False 
@@ -1703,6 +1702,19 @@ class HTMLGenerator:
             tech_specs=technical_block,
             data=data
         )
+        return output, technical_block
+
+    def generate_single(self, json_file, data=None):
+        """
+        Liest eine JSON (falls 'data' nicht schon übergeben wurde), rendert sie
+        und schreibt HTML + Marvin-JSON jeweils genau einmal.
+        """
+        if data is None:
+            json_path = os.path.join(self.json_folder, json_file)
+            with open(json_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+
+        output, technical_block = self.render(data)
         
         output_filename = json_file.replace(".json", ".html")
         output_path = os.path.join(self.output_folder, output_filename)
@@ -1717,17 +1729,12 @@ class HTMLGenerator:
             
         return output_path
 
-    def generate_all(self):
+    def generate_all(self, workers=1, incremental=True):
+        """
+        workers > 1 (oder None = alle Kerne) verteilt die Dateien auf mehrere Prozesse.
+        incremental: nur neue/geänderte JSONs (Manifest), False = alles neu bauen.
+        """
+        from .post_processor import run_post_processing
         print(f"🔄 Generiere HTMLs aus {self.json_folder}...")
-        files = [f for f in os.listdir(self.json_folder) if f.endswith('.json')]
-        
-        if not files:
-            print("⚠️ Keine JSON-Dateien gefunden.")
-            return
-
-        for f in files:
-            try:
-                self.generate_single(f)
-                print(f" - {f} -> HTML & Marvin-JSON ✅")
-            except Exception as e:
-                print(f"❌ Fehler bei {f}: {e}")
\ No newline at end of file
+        run_post_processing(self.json_folder, self.output_folder, self.template_path,
+                            self.marvin.output_folder, workers=workers, incremental=incremental)
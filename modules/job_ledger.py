@@ -0,0 +1,227 @@
+import os
+import time
+from .sqlite_store import SQLiteStore
+from .config import MAX_JOB_ATTEMPTS
+
+# --- STATUS-WERTE ---
+PENDING = "pending"
+DONE = "done"
+FAILED = "failed"
+LOW_QUALITY = "low_quality"
+SKIPPED = "skipped"
+
+# Diese Jobs gelten als erledigt (JSON liegt vor bzw. nicht verarbeitbar)
+FINISHED_STATES = (DONE, LOW_QUALITY, SKIPPED)
+
+
+class JobLedger(SQLiteStore):
+    """
+    Persistentes Auftragsbuch für die Anreicherung.
+    Schlüssel ist die bereinigte Artikelnummer (= Name der JSON in output_JSON,
+    Fallback: Produktname), die GTIN wird mitgeführt.
+    Ein Neustart nach Absturz oder ABBRECHEN plant seine Arbeit hieraus, statt
+    jede Zeile per os.path.exists zu prüfen.
+    Neu anreichern erzwingen: JSON in output_JSON löschen -> der Job wird beim nächsten Lauf
+    wieder geöffnet (siehe reopen / is_file_complete). Alles neu: job_ledger.sqlite löschen.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS jobs (
+            job_key     TEXT PRIMARY KEY,
+            art_nr      TEXT,
+            gtin        TEXT,
+            name        TEXT,
+            category    TEXT,
+            source_file TEXT,
+            status      TEXT NOT NULL DEFAULT 'pending',
+            attempts    INTEGER NOT NULL DEFAULT 0,
+            last_error  TEXT,
+            updated_at  REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_jobs_gtin ON jobs(gtin);
+        CREATE INDEX IF NOT EXISTS idx_jobs_source ON jobs(source_file, status);
+
+        CREATE TABLE IF NOT EXISTS files (
+            path  TEXT PRIMARY KEY,
+            size  INTEGER,
+            mtime REAL
+        );
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def __init__(self, db_path, max_attempts=MAX_JOB_ATTEMPTS):
+        super().__init__(db_path)
+        self.max_attempts = max_attempts
+        # Status aller Jobs einmalig in den Speicher -> O(1) Lookups beim Planen
+        self._states = {}
+        # Jobs, die per mark() vor register() entstanden sind (z.B. Dedupe-Kopien) -> Stammdaten fehlen noch
+        self._unregistered = set()
+        for key, status, attempts, source_file in self.query("SELECT job_key, status, attempts, source_file FROM jobs"):
+            self._states[key] = (status, attempts)
+            if source_file is None: self._unregistered.add(key)
+
+    # --- Planung ---
+    def register(self, records, source_file=None, category=None):
+        """
+        records: Iterable aus (job_key, art_nr, gtin, name). Bekannte Jobs behalten ihren Status,
+        ohne Stammdaten angelegte Jobs (siehe mark) bekommen sie hier nachgetragen. Gibt die Anzahl neuer Jobs zurück.
+        """
+        new_rows = []
+        fill_rows = []
+        now = time.time()
+        for job_key, art_nr, gtin, name in records:
+            if not job_key: continue
+            if job_key not in self._states:
+                self._states[job_key] = (PENDING, 0)
+                new_rows.append((job_key, art_nr, gtin, name, category, source_file, now))
+            elif job_key in self._unregistered and source_file is not None:
+                self._unregistered.discard(job_key)
+                fill_rows.append((art_nr, gtin, name, category, source_file, job_key))
+
+        if new_rows:
+            self.executemany(
+                "INSERT OR IGNORE INTO jobs (job_key, art_nr, gtin, name, category, source_file, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                new_rows
+            )
+        if fill_rows:
+            self.executemany(
+                "UPDATE jobs SET art_nr = ?, gtin = ?, name = ?, category = COALESCE(category, ?), source_file = ? "
+                "WHERE job_key = ?",
+                fill_rows
+            )
+        return len(new_rows)
+
+    def status(self, job_key):
+        return self._states.get(job_key, (None, 0))[0]
+
+    def should_process(self, job_key):
+        status, attempts = self._states.get(job_key, (PENDING, 0))
+        if status in FINISHED_STATES: return False
+        if status == FAILED and attempts >= self.max_attempts: return False
+        return True
+
+    def reopen(self, job_keys):
+        """
+        Erledigte Jobs (fertig / schlechte Qualität), deren JSON gelöscht wurde, wieder auf "offen" setzen.
+        Gibt die Anzahl wieder geöffneter Jobs zurück.
+        """
+        now = time.time()
+        rows = []
+        for job_key in job_keys:
+            if self._states.get(job_key, (None, 0))[0] not in (DONE, LOW_QUALITY): continue
+            self._states[job_key] = (PENDING, 0)
+            rows.append((PENDING, now, job_key))
+
+        if rows:
+            self.executemany(
+                "UPDATE jobs SET status = ?, attempts = 0, last_error = NULL, updated_at = ? WHERE job_key = ?",
+                rows
+            )
+        return len(rows)
+
+    # --- Ergebnisse ---
+    # Upsert: Unbekannte Jobs (z.B. Dedupe-Kopien aus noch nicht gelesenen Dateien) bekommen trotzdem eine Zeile
+    _UPSERT_STATUS = (
+        "INSERT INTO jobs (job_key, status, attempts, last_error, updated_at) VALUES (?, ?, ?, ?, ?) "
+        "ON CONFLICT(job_key) DO UPDATE SET status = excluded.status, attempts = excluded.attempts, "
+        "last_error = excluded.last_error, updated_at = excluded.updated_at"
+    )
+
+    def _remember(self, job_key, status, attempts):
+        if job_key not in self._states: self._unregistered.add(job_key)
+        self._states[job_key] = (status, attempts)
+
+    def mark(self, job_key, status, error=None):
+        """ Setzt den Status (legt den Job bei Bedarf an). Fehlversuche und schlechte Qualität zählen als Versuch. """
+        _, attempts = self._states.get(job_key, (PENDING, 0))
+        if status in (FAILED, LOW_QUALITY):
+            attempts += 1
+        self._remember(job_key, status, attempts)
+        self.execute(self._UPSERT_STATUS, (job_key, status, attempts, str(error)[:500] if error else None, time.time()))
+
+    def mark_many(self, job_keys, status):
+        """ Setzt denselben Status für viele Jobs in einem Rutsch (z.B. Ergebnisse des Vorfilters). """
+        now = time.time()
+        rows = []
+        for job_key in job_keys:
+            old_status, attempts = self._states.get(job_key, (PENDING, 0))
+            if old_status == status: continue
+            if status in (FAILED, LOW_QUALITY):
+                attempts += 1
+            self._remember(job_key, status, attempts)
+            rows.append((job_key, status, attempts, None, now))
+
+        if rows:
+            self.executemany(self._UPSERT_STATUS, rows)
+        return len(rows)
+
+    def jobs_with_status(self, status):
+        """ Alle Jobs mit diesem Status, die noch Versuche übrig haben: (job_key, art_nr, gtin, name, category). """
+        return self.query(
+            "SELECT job_key, art_nr, gtin, name, category FROM jobs WHERE status = ? AND attempts < ? ORDER BY updated_at",
+            (status, self.max_attempts)
+        )
+
+    # --- Dateien ---
+    def is_file_complete(self, path, output_folder=None):
+        """
+        True, wenn die Datei unverändert ist und keine offenen Jobs mehr hat -> muss nicht mal gelesen werden.
+        Mit output_folder zählt eine gelöschte JSON eines erledigten Jobs als offen (Neu-Anreicherung erzwingen).
+        """
+        row = self.query_one("SELECT size, mtime FROM files WHERE path = ?", (path,))
+        if not row: return False
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return False
+        if row[0] != stat.st_size or row[1] != stat.st_mtime: return False
+
+        open_jobs = self.query_one(
+            "SELECT COUNT(*) FROM jobs WHERE source_file = ? AND "
+            "(status = ? OR (status = ? AND attempts < ?))",
+            (path, PENDING, FAILED, self.max_attempts)
+        )[0]
+        if open_jobs: return False
+        if output_folder is None: return True
+
+        finished = self.query(
+            "SELECT job_key FROM jobs WHERE source_file = ? AND status IN (?, ?)",
+            (path, DONE, LOW_QUALITY)
+        )
+        return all(os.path.exists(os.path.join(output_folder, f"{key}.json")) for key, in finished)
+
+    def mark_file(self, path):
+        stat = os.stat(path)
+        self.execute(
+            "INSERT OR REPLACE INTO files (path, size, mtime) VALUES (?, ?, ?)",
+            (path, stat.st_size, stat.st_mtime)
+        )
+
+    # --- Migration & Fortschritt ---
+    def import_existing_outputs(self, output_folder):
+        """ Einmalig: Bereits vorhandene JSONs (aus Läufen vor dem Ledger) als erledigt übernehmen. """
+        if self.query_one("SELECT value FROM meta WHERE key = 'outputs_imported'"):
+            return 0
+        if not os.path.exists(output_folder):
+            return 0
+
+        keys = [os.path.splitext(f)[0] for f in os.listdir(output_folder) if f.endswith(".json")]
+        self.executemany(
+            "INSERT INTO jobs (job_key, status, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(job_key) DO UPDATE SET status = excluded.status",
+            [(key, DONE, time.time()) for key in keys]
+        )
+        for key in keys:
+            self._remember(key, DONE, self._states.get(key, (DONE, 0))[1])
+        self.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('outputs_imported', ?)", (str(time.time()),))
+        return len(keys)
+
+    def summary(self):
+        counts = {status: 0 for status in (PENDING, DONE, FAILED, LOW_QUALITY, SKIPPED)}
+        for status, _ in self._states.values():
+            counts[status] = counts.get(status, 0) + 1
+        return counts
@@ -0,0 +1,71 @@
+import re
+from functools import lru_cache
+
+
+def _trie_regex(keywords):
+    """
+    Baut aus allen Keywords EINE Regex in Trie-Form (gemeinsame Präfixe zusammengefasst).
+    An jeder Position matcht sie das LÄNGSTE Keyword, das dort beginnt.
+    """
+    trie = {}
+    for word in keywords:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node):
+        is_end = "" in node
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch != ""]
+        if not branches: return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        return f"(?:{body})?" if is_end else body
+
+    return build(trie)
+
+
+class KeywordMatcher:
+    """
+    Einmal kompilierter Multi-Keyword-Matcher für Regelwerke wie ROUTER_RULES
+    oder smart_sorter.KEYWORD_RULES.
+
+    rules: Liste/Items aus (Kategorie, [Keywords]) in Prioritäts-Reihenfolge.
+    match() liefert - wie die alten verschachtelten Schleifen - die ERSTE Kategorie
+    in Regel-Reihenfolge, deren Keyword als Teilstring im Text vorkommt.
+    """
+
+    def __init__(self, rules, cache_size=65536):
+        self.categories = []
+        priority = {}
+        for index, (category, keywords) in enumerate(rules):
+            self.categories.append(category)
+            for kw in keywords:
+                if kw: priority.setdefault(kw, index)
+
+        # Alle Keywords, die an derselben Position beginnen, sind Präfixe des längsten Treffers.
+        # Deshalb reicht es, pro Treffer die beste Priorität seiner Präfix-Kette vorzuberechnen.
+        self._best_priority = {
+            kw: min(prio for other, prio in priority.items() if kw.startswith(other))
+            for kw in priority
+        }
+        self._pattern = re.compile(_trie_regex(priority)) if priority else None
+        self.match = lru_cache(maxsize=cache_size)(self._match)
+
+    def _match(self, text):
+        if self._pattern is None or not text:
+            return None
+
+        search = self._pattern.search
+        best = None
+        pos = 0
+        while True:
+            m = search(text, pos)
+            if m is None: break
+            prio = self._best_priority[m.group()]
+            if best is None or prio < best:
+                best = prio
+                if best == 0: break
+            # Nächste Suche ab der folgenden Position -> auch überlappende Keywords werden gefunden
+            pos = m.start() + 1
+
+        return self.categories[best] if best is not None else None
@@ -2,6 +2,7 @@ import os
 import datetime
 import csv
 import re
+import threading
 from .config import ERROR_FOLDER
 
 # Stelle sicher, dass der Error-Ordner existiert
@@ -10,6 +11,9 @@ if not os.path.exists(ERROR_FOLDER):
 
 CSV_LOG_FILE = os.path.join(ERROR_FOLDER, "failed_articles.csv")
 
+# Parallel laufende Artikel dürfen die CSV nicht gleichzeitig beschreiben
+_log_lock = threading.Lock()
+
 def sanitize_filename(name):
     """ Entfernt Zeichen, die in Windows-Dateinamen verboten sind. """
     if not name: return "unknown_error"
@@ -22,6 +26,10 @@ def log_error(product_name, gtin, error_message, raw_content=""):
     """
     timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     
+    with _log_lock:
+        _write_error_log(timestamp, product_name, gtin, error_message, raw_content)
+
+def _write_error_log(timestamp, product_name, gtin, error_message, raw_content):
     # 1. CSV Eintrag
     file_exists = os.path.isfile(CSV_LOG_FILE)
     try:
@@ -0,0 +1,188 @@
+import io
+import os
+import json
+import hashlib
+from contextlib import redirect_stdout, nullcontext
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from . import html_generator, json_mapper
+from .html_generator import HTMLGenerator
+from .json_mapper import MarvinMapper
+
+# ==============================================================================
+# 🏭 POST-PROCESSING (JSON -> HTML + Marvin-JSON), optional auf allen Kernen
+# ==============================================================================
+# Jeder Worker-Prozess baut sich EINMAL seinen HTMLGenerator / MarvinMapper
+# (Jinja-Template wird pro Prozess nur einmal kompiliert). Die print-Ausgaben
+# eines Artikels werden im Worker gesammelt und im Hauptprozess am Stück
+# ausgegeben, damit sich die Logs verschiedener Kerne nicht vermischen.
+# Pro Artikel: JSON einmal lesen, im Speicher rendern, HTML + Marvin-JSON je einmal schreiben.
+
+# Manifest im HTML-Ordner: Hash jeder Eingabe-JSON + Version von Template/Generator-Code.
+# Unveränderte Artikel werden beim nächsten Lauf übersprungen.
+MANIFEST_NAME = ".postprocess_manifest.json"
+
+_html_gen = None
+_mapper = None
+_json_folder = None
+
+
+def _init_worker(json_folder, html_folder, template_path, marvin_folder):
+    global _html_gen, _mapper, _json_folder
+    _json_folder = json_folder
+    _mapper = MarvinMapper(output_folder=marvin_folder)
+    try:
+        _html_gen = HTMLGenerator(json_folder=json_folder, output_folder=html_folder, template_path=template_path)
+        _html_gen.marvin = _mapper
+    except Exception as e:
+        print(f"⚠️ HTML-Generator konnte nicht geladen werden: {e}")
+        _html_gen = None
+
+
+def _render_and_map(filename):
+    with open(os.path.join(_json_folder, filename), 'r', encoding='utf-8') as f:
+        data = json.load(f)
+
+    if _html_gen:
+        # Rendert im Speicher, schreibt HTML + Marvin-JSON (mit Technik-Block) genau einmal
+        _html_gen.generate_single(filename, data=data)
+    else:
+        _mapper.create_json(filename, data, html_content="")
+
+
+def _process_file(filename, capture=True):
+    """ Verarbeitet eine JSON. Gibt (Dateiname, ok, Log-Text) zurück. """
+    buffer = io.StringIO()
+    ok = True
+    with redirect_stdout(buffer) if capture else nullcontext():
+        try:
+            _render_and_map(filename)
+        except Exception as e:
+            ok = False
+            print(f"❌ Fehler bei {filename}: {e}")
+    return filename, ok, buffer.getvalue()
+
+
+def _file_hash(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def generator_version(template_path):
+    """ Ändert sich, sobald Template, HTML-Generator oder Marvin-Mapper geändert werden. """
+    digest = hashlib.sha1()
+    for path in (template_path, html_generator.__file__, json_mapper.__file__):
+        try:
+            digest.update(_file_hash(path).encode())
+        except OSError:
+            digest.update(b"missing")
+    return digest.hexdigest()
+
+
+class Manifest:
+    def __init__(self, html_folder, version):
+        self.path = os.path.join(html_folder, MANIFEST_NAME)
+        self.html_folder = html_folder
+        self.version = version
+        self.entries = {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+            if stored.get("version") == version:
+                self.entries = stored.get("files", {})
+        except (OSError, ValueError):
+            pass
+
+    def changed(self, json_folder, filename):
+        """ True, wenn die JSON neu/geändert ist oder das HTML fehlt. Gibt zusätzlich den neuen Eintrag zurück. """
+        path = os.path.join(json_folder, filename)
+        stat = os.stat(path)
+        entry = self.entries.get(filename)
+        html_exists = os.path.exists(os.path.join(self.html_folder, filename.replace(".json", ".html")))
+
+        # Schneller Weg: Größe + Änderungszeit identisch -> nicht mal hashen
+        if entry and html_exists and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime_ns:
+            return False, entry
+
+        new_entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "sha1": _file_hash(path)}
+        if entry and html_exists and entry["sha1"] == new_entry["sha1"]:
+            self.entries[filename] = new_entry
+            return False, new_entry
+        return True, new_entry
+
+    def save(self):
+        os.makedirs(self.html_folder, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": self.version, "files": self.entries}, f)
+        os.replace(tmp_path, self.path)
+
+
+def run_post_processing(json_folder, html_folder="output_HTML", template_path="templates/template.html",
+                        marvin_folder="output_JSON_Marvin", workers=None, incremental=True, log=print):
+    """
+    Erzeugt HTML + Marvin-JSON für alle JSONs in json_folder.
+    workers: Anzahl Prozesse (None = alle Kerne, 1 = alles im aktuellen Prozess).
+    incremental: Nur neue/geänderte JSONs verarbeiten (Manifest, siehe oben).
+    Gibt (Anzahl OK, Anzahl Fehler) zurück.
+    """
+    if not os.path.exists(json_folder):
+        return 0, 0
+
+    files = sorted(f for f in os.listdir(json_folder) if f.endswith('.json'))
+    if not files:
+        log("⚠️ Keine JSON-Dateien gefunden.")
+        return 0, 0
+
+    manifest = Manifest(html_folder, generator_version(template_path)) if incremental else None
+    pending_entries = {}
+    if manifest:
+        # Einträge gelöschter JSONs verwerfen
+        manifest.entries = {name: entry for name, entry in manifest.entries.items() if name in set(files)}
+        todo = []
+        for filename in files:
+            is_changed, entry = manifest.changed(json_folder, filename)
+            if is_changed:
+                todo.append(filename)
+                pending_entries[filename] = entry
+        if len(todo) < len(files):
+            log(f"📋 Manifest: {len(files) - len(todo)} unverändert, {len(todo)} neu/geändert.")
+        files = todo
+        if not files:
+            manifest.save()
+            log("🏁 Post-Processing: Nichts zu tun, alles aktuell.")
+            return 0, 0
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    # Pool-Start lohnt sich erst ab einer gewissen Menge
+    workers = max(1, min(workers, len(files) // 20 or 1))
+
+    init_args = (json_folder, html_folder, template_path, marvin_folder)
+    ok_count = 0
+    fail_count = 0
+
+    def report(result):
+        nonlocal ok_count, fail_count
+        filename, ok, output = result
+        if output: log(output.rstrip())
+        if ok:
+            ok_count += 1
+            if manifest: manifest.entries[filename] = pending_entries[filename]
+            log(f" - {filename} -> HTML & Marvin-JSON ✅")
+        else:
+            fail_count += 1
+
+    if workers == 1:
+        _init_worker(*init_args)
+        for filename in files:
+            report(_process_file(filename, capture=False))
+    else:
+        log(f"⚡ Post-Processing auf {workers} Kernen für {len(files)} Dateien...")
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=init_args) as pool:
+            futures = [pool.submit(_process_file, filename) for filename in files]
+            for future in as_completed(futures):
+                report(future.result())
+
+    if manifest: manifest.save()
+    log(f"🏁 Post-Processing fertig: {ok_count} OK | {fail_count} Fehler")
+    return ok_count, fail_count
@@ -1,8 +1,13 @@
-from .config import OPENAI_API_KEY, MODEL_NAME
+import re
+import threading
+from .config import OPENAI_API_KEY, MODEL_NAME, ROUTER_CACHE_FILE
+from .rate_limiter import make_http_client
+from .sqlite_store import SQLiteStore
+from .keyword_matcher import KeywordMatcher
 from openai import OpenAI
 
-# Client initialisieren
-client = OpenAI(api_key=OPENAI_API_KEY)
+# Client initialisieren (teilt sich den OpenAI-Limiter mit dem Agenten)
+client = OpenAI(api_key=OPENAI_API_KEY, http_client=make_http_client("openai"))
 
 # ==============================================================================
 # 🚦 ROUTER KONFIGURATION
@@ -21,6 +26,52 @@ ROUTER_RULES = [
     ("Eingabegeräte", ["maus", "tastatur", "keyboard", "mouse", "keypad"]), # Hier landen die neuen
 ]
 
+# Einmal kompiliert: findet alle Keywords in einem Durchlauf, Priorität = Reihenfolge oben
+ROUTER_MATCHER = KeywordMatcher(ROUTER_RULES)
+
+# Wie viele unbekannte Artikel pro Batch-Anfrage an das LLM gehen
+ROUTER_BATCH_SIZE = 80
+
+class RouterCache(SQLiteStore):
+    """ Persistenter Cache Produktname -> Kategorie für den AI-Router. """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS router (
+            name_key TEXT PRIMARY KEY,
+            category TEXT NOT NULL
+        );
+    """
+
+    def get(self, product_name):
+        row = self.query_one("SELECT category FROM router WHERE name_key = ?", (_router_key(product_name),))
+        return row[0] if row else None
+
+    def put_many(self, pairs):
+        self.executemany(
+            "INSERT OR REPLACE INTO router (name_key, category) VALUES (?, ?)",
+            [(_router_key(name), category) for name, category in pairs]
+        )
+
+_router_cache = None
+_router_cache_lock = threading.Lock()
+
+def get_router_cache():
+    global _router_cache
+    with _router_cache_lock:
+        if _router_cache is None:
+            _router_cache = RouterCache(ROUTER_CACHE_FILE)
+        return _router_cache
+
+def _router_key(product_name):
+    return re.sub(r'\s+', ' ', str(product_name).lower()).strip()
+
+def _fast_lane(name_lower):
+    return ROUTER_MATCHER.match(name_lower)
+
+def _clean_ai_category(text):
+    category = text.strip()
+    if ":" in category: category = category.split(":")[-1].strip()
+    return category
+
 def classify_product_type(product_name, gtin):
     """
     Der 'Router': Entscheidet, was das Produkt ist.
@@ -28,10 +79,15 @@ def classify_product_type(product_name, gtin):
     name_lower = product_name.lower()
     
     # --- 🏎️ FAST LANE ---
-    for category, keywords in ROUTER_RULES:
-        for kw in keywords:
-            if kw in name_lower:
-                return category
+    category = _fast_lane(name_lower)
+    if category:
+        return category
+
+    # --- 💾 CACHE (auch von classify_products_batch befüllt) ---
+    cache = get_router_cache()
+    category = cache.get(product_name)
+    if category:
+        return category
 
     # --- 🧠 AI Router ---
     try:
@@ -47,13 +103,91 @@ def classify_product_type(product_name, gtin):
             ],
             temperature=0.0
         )
-        category = response.choices[0].message.content.strip()
-        if ":" in category: category = category.split(":")[-1].strip()
+        category = _clean_ai_category(response.choices[0].message.content)
+        cache.put_many([(product_name, category)])
         return category
     except Exception as e:
         print(f"   ⚠️ Router-Fehler: {e}")
         return "Sonstiges"
 
+def classify_products_batch(products, batch_size=ROUTER_BATCH_SIZE):
+    """
+    Klassifiziert viele Artikel auf einmal. products: Liste aus (Produktname, GTIN).
+    Fast Lane und Cache zuerst, alle übrigen Namen gehen gesammelt in EINE Anfrage
+    pro Batch (eine Kategorie pro Zeile). Gibt die Kategorien in Eingabe-Reihenfolge zurück.
+    """
+    cache = get_router_cache()
+    results = [None] * len(products)
+    pending = {}  # Produktname -> (GTIN, [Indizes])
+
+    for i, (name, gtin) in enumerate(products):
+        category = _fast_lane(name.lower()) or cache.get(name)
+        if category:
+            results[i] = category
+        else:
+            pending.setdefault(name, (gtin, []))[1].append(i)
+
+    known_cats = [rule[0] for rule in ROUTER_RULES]
+    cat_list_str = ", ".join(known_cats)
+    names = list(pending.keys())
+
+    for start in range(0, len(names), batch_size):
+        chunk = names[start:start + batch_size]
+        lines = []
+        for n, name in enumerate(chunk, start=1):
+            gtin = pending[name][0]
+            lines.append(f"{n}. {name}" + (f" (GTIN: {gtin})" if gtin else ""))
+
+        answers = {}
+        try:
+            response = client.chat.completions.create(
+                model=MODEL_NAME,
+                messages=[
+                    {"role": "system", "content": (
+                        f"Ordne JEDEN Artikel zu: [{cat_list_str}, Sonstiges]. "
+                        f"Antworte mit genau einer Zeile pro Artikel im Format 'Nummer: Kategorie', sonst nichts."
+                    )},
+                    {"role": "user", "content": "\n".join(lines)}
+                ],
+                temperature=0.0
+            )
+            for line in response.choices[0].message.content.splitlines():
+                match = re.match(r'\s*(\d+)\s*[:.)\-]\s*(.+)$', line)
+                if match:
+                    answers[int(match.group(1))] = _clean_ai_category(match.group(2))
+        except Exception as e:
+            print(f"   ⚠️ Batch-Router-Fehler: {e}")
+
+        new_pairs = []
+        for n, name in enumerate(chunk, start=1):
+            category = answers.get(n)
+            if not category:
+                # Zeile fehlt in der Antwort -> Einzel-Router als Fallback
+                category = classify_product_type(name, pending[name][0])
+            else:
+                new_pairs.append((name, category))
+            for i in pending[name][1]:
+                results[i] = category
+        if new_pairs:
+            cache.put_many(new_pairs)
+
+    if names:
+        print(f"   🧠 Batch-Router: {len(names)} Artikel mit {-(-len(names) // batch_size)} LLM-Anfrage(n) zugeordnet.")
+    return results
+
+def has_valid_gtin(gtin):
+    """ Ist die GTIN plausibel (länger als 8 Zeichen)? """
+    return bool(gtin) and len(str(gtin)) > 8 and str(gtin).lower() not in ["n/a", "nan", "none", "", "0"]
+
+def build_search_queries(product_name, gtin):
+    """
+    Die Suchbegriffe der GTIN-Strategie in Reihenfolge (Agent-Prompt und Direkt-Extraktion nutzen dieselben).
+    Mit GTIN: Fingerabdruck-Suche, Fallback nur Name. Ohne GTIN: Datenblatt, dann EAN.
+    """
+    if has_valid_gtin(gtin):
+        return [f"{product_name} {gtin} Specs Datenblatt", f"{product_name} Specs Datenblatt"]
+    return [f"{product_name} Specs Datenblatt", f"{product_name} EAN"]
+
 def get_prompt_by_category(product_name, gtin, forced_category=None):
     """ 
     Wählt den Prompt. 
@@ -69,17 +203,14 @@ def get_prompt_by_category(product_name, gtin, forced_category=None):
     cat_lower = category.lower()
 
     # --- INTELLIGENTE GTIN-STRATEGIE 🧠 (GOOGLE AI MODUS) ---
-    has_valid_gtin = False
-    # Check: Ist die GTIN plausibel (länger als 8 Zeichen)?
-    if gtin and len(str(gtin)) > 8 and str(gtin).lower() not in ["n/a", "nan", "none", "", "0"]:
-        has_valid_gtin = True
+    queries = build_search_queries(product_name, gtin)
 
-    if has_valid_gtin:
+    if has_valid_gtin(gtin):
         # Happy Path: EXAKTE GOOGLE SYNTAX für beste Treffer
         search_strategy = f"""
         STRATEGIE (GOOGLE AI OVERVIEW METHODE):
         1. Führe ZWINGEND als ersten Schritt eine Suche mit EXAKT diesem String durch:
-           "{product_name} {gtin} Specs Datenblatt"
+           "{queries[0]}"
         2. Dies ist der "Fingerabdruck" des Produkts. Vertraue primär Ergebnissen, die diese GTIN bestätigen.
         3. Ignoriere allgemeine Shopping-Seiten. Suche nach PDF-Datenblättern oder Herstellerseiten (Asus, MSI, Kingston etc.).
         """
@@ -88,7 +219,7 @@ def get_prompt_by_category(product_name, gtin, forced_category=None):
         search_strategy = f"""
         STRATEGIE (KRITISCH - KEINE GTIN VORHANDEN):
         1. SCHRITT 1: Identifikation! Suche zuerst nach der GTIN/EAN für das Produkt "{product_name}".
-           Suchbegriff: "{product_name} Specs Datenblatt" oder "{product_name} EAN".
+           Suchbegriff: "{queries[0]}" oder "{queries[1]}".
         2. VERIFIZIERUNG: Vergleiche das gefundene Produkt GENAU mit dem Namen.
         3. WICHTIG: Schreibe die gefundene GTIN zwingend in das JSON-Feld "_Original_GTIN", damit wir sie speichern!
         """
@@ -0,0 +1,156 @@
+import re
+import time
+import threading
+from .config import RATE_LIMITS
+
+# ==============================================================================
+# 🚦 ADAPTIVER RATE-LIMITER (Token-Bucket pro Anbieter)
+# ==============================================================================
+# Jeder Anbieter (OpenAI, Tavily) hat einen eigenen Bucket, den sich ALLE Threads
+# teilen. Bei 429/Retry-After wird der Anbieter pausiert und die Rate halbiert,
+# danach wird sie mit jeder erfolgreichen Anfrage langsam wieder hochgefahren.
+
+MAX_BACKOFF = 60.0
+
+
+def parse_duration(value):
+    """
+    Wandelt Header-Werte wie "2", "1.5", "20ms", "6m0s" oder "1h2m3s" in Sekunden um.
+    Gibt None zurück, wenn nichts Sinnvolles drin steht.
+    """
+    if value is None: return None
+    text = str(value).strip().lower()
+    if not text: return None
+    try:
+        return float(text)
+    except ValueError:
+        pass
+
+    total = 0.0
+    found = False
+    for number, unit in re.findall(r'(\d+(?:\.\d+)?)(ms|h|m|s)', text):
+        found = True
+        number = float(number)
+        if unit == "ms": total += number / 1000
+        elif unit == "h": total += number * 3600
+        elif unit == "m": total += number * 60
+        else: total += number
+    return total if found else None
+
+
+class ProviderLimiter:
+    def __init__(self, name, requests_per_second, burst=1, min_rate=None):
+        self.name = name
+        self.max_rate = float(requests_per_second)
+        self.rate = self.max_rate
+        self.min_rate = float(min_rate) if min_rate else self.max_rate / 20
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self.consecutive_throttles = 0
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._last_refill
+        self._last_refill = now
+        self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+
+    def acquire(self, blocking=True):
+        """ Holt ein Token. Blockiert (falls gewünscht), bis eins verfügbar ist. """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._refill(now)
+                if now < self.blocked_until:
+                    wait_time = self.blocked_until - now
+                elif self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                else:
+                    wait_time = (1 - self.tokens) / self.rate
+            if not blocking:
+                return False
+            time.sleep(min(wait_time, 1.0))
+
+    def report_success(self):
+        """ Additive Erholung: Nach einer Drosselung wird die Rate schrittweise wieder erhöht. """
+        with self._lock:
+            self.consecutive_throttles = 0
+            if self.rate < self.max_rate:
+                self.rate = min(self.max_rate, self.rate + self.max_rate * 0.05)
+
+    def report_throttle(self, retry_after=None):
+        """ 429 o.ä. erhalten: Anbieter pausieren und Rate halbieren. """
+        with self._lock:
+            self.consecutive_throttles += 1
+            if retry_after is None:
+                retry_after = min(MAX_BACKOFF, 2 ** self.consecutive_throttles)
+            self.blocked_until = max(self.blocked_until, time.monotonic() + retry_after)
+            self.rate = max(self.min_rate, self.rate / 2)
+            self.tokens = 0.0
+        print(f"   🚦 {self.name}: Rate-Limit erreicht -> Pause {retry_after:.1f}s, neue Rate {self.rate:.2f}/s")
+
+    def slow_down(self, factor=0.5):
+        """ Vorausschauend bremsen (z.B. wenn das Restkontingent knapp wird). """
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate * factor)
+
+    # --- Auswertung von HTTP-Antworten (httpx Event-Hook) ---
+    def observe_response(self, response):
+        headers = response.headers
+        if response.status_code == 429:
+            retry_after = parse_duration(headers.get("retry-after-ms"))
+            if retry_after is not None:
+                retry_after = retry_after / 1000
+            else:
+                retry_after = parse_duration(headers.get("retry-after"))
+            if retry_after is None:
+                retry_after = parse_duration(headers.get("x-ratelimit-reset-requests"))
+            self.report_throttle(retry_after)
+            return
+
+        if response.status_code < 400:
+            self.report_success()
+
+        # OpenAI liefert das Restkontingent mit -> rechtzeitig bremsen statt gegen die Wand fahren
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            try:
+                remaining, limit = float(remaining), float(limit)
+            except (TypeError, ValueError):
+                continue
+            if limit > 0 and remaining / limit < 0.05:
+                self.slow_down()
+                break
+
+
+_limiters = {}
+_registry_lock = threading.Lock()
+
+
+def get_limiter(provider):
+    """ Liefert den (prozessweit geteilten) Limiter für einen Anbieter. """
+    with _registry_lock:
+        if provider not in _limiters:
+            settings = RATE_LIMITS.get(provider, {"requests_per_second": 1, "burst": 1})
+            _limiters[provider] = ProviderLimiter(provider, **settings)
+        return _limiters[provider]
+
+
+def make_http_client(provider):
+    """
+    httpx-Client, der vor JEDEM Request (auch Retries des OpenAI-SDKs) ein Token holt
+    und jede Antwort (429, Retry-After, Restkontingent) an den Limiter meldet.
+    """
+    import httpx
+
+    limiter = get_limiter(provider)
+    return httpx.Client(
+        timeout=httpx.Timeout(120.0, connect=10.0),
+        event_hooks={
+            "request": [lambda request: limiter.acquire()],
+            "response": [limiter.observe_response],
+        },
+    )
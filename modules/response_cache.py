@@ -0,0 +1,132 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from .sqlite_store import SQLiteStore
+from .config import MODEL_NAME, AGENT_CACHE_FILE, AGENT_CACHE_MODE, AGENT_CACHE_MAX_MB
+
+
+class CacheMissError(Exception):
+    """ Replay-Modus: Für diesen Prompt liegt keine gespeicherte Antwort vor. """
+
+
+def make_cache_key(prompt, model=MODEL_NAME, settings=None):
+    """ Inhaltsadresse: Hash über Prompt + Modell + Tool-/Agent-Einstellungen. """
+    payload = json.dumps(
+        {"prompt": prompt, "model": model, "settings": settings or {}},
+        sort_keys=True, ensure_ascii=False
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def extract_json(response_text):
+    """ Erstes {...} aus der Antwort als dict - oder None, wenn keins drin ist bzw. es kein gültiges JSON ist. """
+    json_match = re.search(r'\{.*\}', response_text or "", re.DOTALL)
+    if not json_match:
+        return None
+    try:
+        data = json.loads(json_match.group(0))
+    except ValueError:
+        return None
+    return data if isinstance(data, dict) else None
+
+
+class ResponseCache(SQLiteStore):
+    """
+    Festplatten-Cache für agent.run()-Antworten mit Größenlimit (LRU).
+    Modi: "on" (lesen + schreiben), "off" (durchreichen), "replay" (nur lesen, nie Netzwerk).
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS responses (
+            cache_key   TEXT PRIMARY KEY,
+            response    TEXT NOT NULL,
+            size        INTEGER NOT NULL,
+            created_at  REAL,
+            last_access REAL
+        );
+        CREATE INDEX IF NOT EXISTS idx_responses_access ON responses(last_access);
+    """
+
+    def __init__(self, db_path, mode="on", max_mb=200):
+        super().__init__(db_path)
+        self.mode = mode
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._total_bytes = self.query_one("SELECT COALESCE(SUM(size), 0) FROM responses")[0]
+
+    def get(self, cache_key):
+        row = self.query_one("SELECT response FROM responses WHERE cache_key = ?", (cache_key,))
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.execute("UPDATE responses SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+        return row[0]
+
+    def put(self, cache_key, response):
+        size = len(response.encode("utf-8"))
+        now = time.time()
+        with self._lock:
+            old = self.query_one("SELECT size FROM responses WHERE cache_key = ?", (cache_key,))
+            self.execute(
+                "INSERT OR REPLACE INTO responses (cache_key, response, size, created_at, last_access) VALUES (?, ?, ?, ?, ?)",
+                (cache_key, response, size, now, now)
+            )
+            self._total_bytes += size - (old[0] if old else 0)
+            if self._total_bytes > self.max_bytes:
+                self._evict()
+
+    def delete(self, cache_key):
+        """ Eintrag verwerfen (z.B. Antwort ließ sich nicht speichern) -> der nächste Versuch fragt neu an. """
+        with self._lock:
+            old = self.query_one("SELECT size FROM responses WHERE cache_key = ?", (cache_key,))
+            if old is None: return
+            self.execute("DELETE FROM responses WHERE cache_key = ?", (cache_key,))
+            self._total_bytes -= old[0]
+
+    def _evict(self):
+        """ Älteste (am längsten nicht genutzte) Einträge löschen, bis wir bei 90% des Limits sind. """
+        target = int(self.max_bytes * 0.9)
+        victims = []
+        freed = 0
+        for cache_key, size in self.query("SELECT cache_key, size FROM responses ORDER BY last_access ASC"):
+            if self._total_bytes - freed <= target: break
+            victims.append((cache_key,))
+            freed += size
+        self.executemany("DELETE FROM responses WHERE cache_key = ?", victims)
+        self._total_bytes -= freed
+
+    def run(self, agent, prompt, settings=None, **run_kwargs):
+        """
+        agent.run(prompt) mit Cache davor. Gespeichert werden nur Antworten mit gültigem JSON-Objekt.
+        run_kwargs werden an agent.run durchgereicht (z.B. Produktname/GTIN für die Direkt-Extraktion).
+        """
+        if self.mode == "off":
+            return agent.run(prompt, **run_kwargs)
+
+        cache_key = make_cache_key(prompt, settings=settings)
+        cached = self.get(cache_key)
+        if cached is not None:
+            return cached
+        if self.mode == "replay":
+            raise CacheMissError("Replay-Modus: Keine gespeicherte Agent-Antwort für diesen Prompt.")
+
+        response = agent.run(prompt, **run_kwargs)
+        if extract_json(response) is not None:
+            self.put(cache_key, response)
+        return response
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_response_cache():
+    """ Prozessweit geteilter Cache, konfiguriert über modules/config.py. """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ResponseCache(AGENT_CACHE_FILE, mode=AGENT_CACHE_MODE, max_mb=AGENT_CACHE_MAX_MB)
+        return _cache
@@ -0,0 +1,154 @@
+import re
+import json
+from functools import lru_cache
+from .config import QUALITY_MIN_COVERAGE
+from .prompts import get_prompt_by_category
+
+# Marker, hinter dem jeder Kategorie-Prompt seine Ziel-Struktur beschreibt
+TEMPLATE_MARKER = "Benötigte JSON-Struktur"
+
+# Werte, die als "nicht gefunden" zählen ("Nein" ist dagegen eine echte Angabe)
+MISSING_VALUES = {"n/a", "na", "", "nicht verfügbar", "unknown", "none", "null", "-"}
+
+# Felder, deren Beispieltext N/A erlaubt ("Wenn verfügbar", "oder N/A"...), sind optional
+OPTIONAL_HINT = re.compile(r"n/a|falls|wenn|optional", re.IGNORECASE)
+
+
+def extract_template(prompt):
+    """
+    Liest die "Benötigte JSON-Struktur" aus einem Kategorie-Prompt als Dict.
+    Gibt None zurück, wenn der Prompt keine (parsebare) Struktur enthält.
+    """
+    start = prompt.find(TEMPLATE_MARKER)
+    if start < 0: return None
+    start = prompt.find("{", start)
+    end = prompt.rfind("}")
+    if start < 0 or end < start: return None
+
+    block = prompt[start:end + 1]
+    # Zoll-Angaben wie "2.5"" im Beispieltext sind kein gültiges JSON
+    block = re.sub(r'(?<=\d)""', r'\\""', block)
+    try:
+        template = json.loads(block)
+    except ValueError:
+        return None
+    return template if isinstance(template, dict) else None
+
+
+def _node_schema(value):
+    if isinstance(value, dict):
+        return {
+            "type": "object",
+            "properties": {key: _node_schema(child) for key, child in value.items()},
+            "required": list(value.keys()),
+            "additionalProperties": False,
+        }
+    if isinstance(value, list):
+        return {"type": "array", "items": {"type": "string"}, "description": ", ".join(map(str, value))}
+    return {"type": "string", "description": str(value)}
+
+
+def template_to_json_schema(template, with_product_name=True):
+    """ Strenges JSON-Schema (Structured Outputs): Alle Felder Pflicht, Werte als Text mit Einheit oder "N/A". """
+    template = dict(template)
+    if with_product_name:
+        template.setdefault("Produktname", "Offizieller Produktname laut Hersteller")
+    return _node_schema(template)
+
+
+@lru_cache(maxsize=256)
+def json_schema_for_prompt(prompt):
+    template = extract_template(prompt)
+    return template_to_json_schema(template) if template else None
+
+
+def is_filled(value):
+    if isinstance(value, dict): return any(is_filled(v) for v in value.values())
+    if isinstance(value, list): return any(is_filled(v) for v in value)
+    return value is not None and str(value).lower().strip() not in MISSING_VALUES
+
+
+class CategorySchema:
+    """
+    Einmal kompilierte Ziel-Struktur einer Kategorie (aus dem Prompt in modules/prompts.py).
+    validate() bewertet jedes Feld einzeln statt pauschal "mehr als 50% N/A".
+    """
+
+    def __init__(self, category, template):
+        self.category = category
+        self.template = template
+        self.json_schema = template_to_json_schema(template)
+        # Flache Feldliste: (Pfad, Pflichtfeld?)
+        self.fields = []
+        self._compile(template, ())
+
+    def hint(self, path):
+        """ Beispieltext des Templates für ein Feld (z.B. "z.B. 3200 MHz"). """
+        node = self.template
+        for key in path:
+            node = node.get(key, "") if isinstance(node, dict) else ""
+        return node if isinstance(node, str) else ", ".join(map(str, node)) if isinstance(node, list) else ""
+
+    def _compile(self, node, path):
+        for key, value in node.items():
+            if isinstance(value, dict):
+                self._compile(value, path + (key,))
+            else:
+                optional = isinstance(value, str) and bool(OPTIONAL_HINT.search(value))
+                self.fields.append((path + (key,), not optional))
+
+    @staticmethod
+    def _lookup(data, path, flat):
+        node = data
+        for key in path:
+            node = node.get(key) if isinstance(node, dict) else None
+            if node is None: break
+        # Agent hat das Feld in eine andere Gruppe sortiert -> per Feldname suchen
+        return node if node is not None else flat.get(path[-1])
+
+    def validate(self, data, min_coverage=QUALITY_MIN_COVERAGE):
+        """
+        Gibt einen Bericht zurück:
+        coverage / required_coverage (0..1), fields {"Gruppe > Feld": gefüllt?},
+        missing_required [Feldnamen], is_bad (Pflichtfeld-Abdeckung unter min_coverage).
+        """
+        flat = {}
+        for group in data.values():
+            if isinstance(group, dict):
+                for key, value in group.items(): flat.setdefault(key, value)
+
+        fields = {}
+        missing_required = []
+        filled = required = required_filled = 0
+        for path, is_required in self.fields:
+            ok = is_filled(self._lookup(data, path, flat))
+            fields[" > ".join(path)] = ok
+            filled += ok
+            if is_required:
+                required += 1
+                required_filled += ok
+                if not ok: missing_required.append(" > ".join(path))
+
+        coverage = filled / len(self.fields) if self.fields else 1.0
+        required_coverage = required_filled / required if required else coverage
+        return {
+            "coverage": round(coverage, 3),
+            "required_coverage": round(required_coverage, 3),
+            "fields": fields,
+            "missing_required": missing_required,
+            "is_bad": required_coverage < min_coverage,
+        }
+
+
+@lru_cache(maxsize=128)
+def schema_for_category(category):
+    """ Kompiliertes Schema der Kategorie (oder None, wenn ihr Prompt keine Struktur vorgibt). """
+    if not category: return None
+    template = extract_template(get_prompt_by_category("", "", forced_category=category))
+    return CategorySchema(category, template) if template else None
+
+
+def validate_article(data, category):
+    """ Feld-Bericht für eine angereicherte JSON, None ohne Kategorie-Schema. """
+    schema = schema_for_category(category)
+    return schema.validate(data) if schema else None
@@ -0,0 +1,82 @@
+import re
+import json
+import time
+import hashlib
+import threading
+from .sqlite_store import SQLiteStore
+from .config import SEARCH_CACHE_FILE, SEARCH_CACHE_TTL_HOURS
+
+
+def normalize_query(query):
+    """ Kleinschreibung, Anführungszeichen raus, Leerzeichen zusammenfassen. """
+    text = str(query).lower().replace('"', ' ').replace("'", " ")
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+class SearchCache(SQLiteStore):
+    """
+    Festplatten-Cache für Tavily-Suchen: normalisierte Anfrage -> Ergebnisse (mit TTL).
+    Geschwister-Produkte (WiFi/Non-WiFi, RAM-Kits in anderen Größen) stellen oft
+    dieselben Suchen - die kosten dann keine Credits mehr.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS searches (
+            query_key  TEXT PRIMARY KEY,
+            query      TEXT,
+            results    TEXT NOT NULL,
+            created_at REAL NOT NULL
+        );
+    """
+
+    def __init__(self, db_path, ttl_hours=24):
+        super().__init__(db_path)
+        self.ttl_seconds = ttl_hours * 3600
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+
+    def _key(self, query, params):
+        payload = json.dumps({"q": normalize_query(query), "p": params or {}}, sort_keys=True)
+        return hashlib.sha1(payload.encode("utf-8")).hexdigest()
+
+    def get(self, query, params=None):
+        row = self.query_one(
+            "SELECT results, created_at FROM searches WHERE query_key = ?", (self._key(query, params),)
+        )
+        with self._lock:
+            if row is None:
+                self.misses += 1
+                return None
+            if time.time() - row[1] > self.ttl_seconds:
+                self.expired += 1
+                self.misses += 1
+                return None
+            self.hits += 1
+        return json.loads(row[0])
+
+    def put(self, query, results, params=None):
+        self.execute(
+            "INSERT OR REPLACE INTO searches (query_key, query, results, created_at) VALUES (?, ?, ?, ?)",
+            (self._key(query, params), normalize_query(query), json.dumps(results, ensure_ascii=False), time.time())
+        )
+
+    def purge_expired(self):
+        return self.execute("DELETE FROM searches WHERE created_at < ?", (time.time() - self.ttl_seconds,))
+
+    def stats(self):
+        total = self.hits + self.misses
+        rate = (self.hits / total * 100) if total else 0.0
+        return {"hits": self.hits, "misses": self.misses, "expired": self.expired, "hit_rate": round(rate, 1)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_search_cache():
+    """ Prozessweit geteilter Such-Cache, konfiguriert über modules/config.py. """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = SearchCache(SEARCH_CACHE_FILE, ttl_hours=SEARCH_CACHE_TTL_HOURS)
+        return _cache
@@ -0,0 +1,101 @@
+import os
+import json
+import time
+import threading
+from .sqlite_store import SQLiteStore
+from .dedupe import normalize_gtin
+from .config import SPEC_STORE_FILE
+
+# Stammdaten des jeweiligen Artikels - gehören nicht zur Spezifikation des Produkts
+IDENTITY_FIELDS = ("_Original_GTIN", "_Produktname", "_Artikelnummer")
+
+
+class SpecStore(SQLiteStore):
+    """
+    Dauerhafter Speicher GTIN -> fertige Spec-JSON (über Läufe und Artikelnummern hinweg).
+    Taucht ein bekanntes Produkt unter neuer ArtNr auf (Neu-Listung, Bundle-SKU),
+    entsteht seine JSON aus diesem Speicher statt aus einer neuen Websuche.
+    Nur Einträge mit OK-Qualität werden wiederverwendet.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS specs (
+            gtin_key    TEXT PRIMARY KEY,
+            gtin        TEXT,
+            data        TEXT NOT NULL,
+            source_key  TEXT,
+            low_quality INTEGER NOT NULL DEFAULT 0,
+            updated_at  REAL
+        );
+
+        CREATE TABLE IF NOT EXISTS meta (
+            key   TEXT PRIMARY KEY,
+            value TEXT
+        );
+    """
+
+    def get_many(self, gtins):
+        """ Gibt {normalisierte GTIN: Spec-Dict} für alle bekannten GTINs mit guter Qualität zurück. """
+        keys = sorted({normalize_gtin(g) for g in gtins} - {''})
+        found = {}
+        # SQLite erlaubt nur eine begrenzte Anzahl an Platzhaltern pro Abfrage
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            rows = self.query(
+                f"SELECT gtin_key, data FROM specs WHERE low_quality = 0 AND gtin_key IN ({','.join('?' * len(batch))})",
+                batch
+            )
+            found.update((key, json.loads(data)) for key, data in rows)
+        return found
+
+    def put(self, gtin, data, source_key=None, low_quality=False):
+        """ Speichert die Spec (ohne Stammdaten des Artikels). Gute Qualität wird nie durch schlechte überschrieben. """
+        key = normalize_gtin(gtin)
+        if not key: return False
+        specs = {k: v for k, v in data.items() if k not in IDENTITY_FIELDS}
+        self.execute(
+            "INSERT INTO specs (gtin_key, gtin, data, source_key, low_quality, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(gtin_key) DO UPDATE SET gtin = excluded.gtin, data = excluded.data, "
+            "source_key = excluded.source_key, low_quality = excluded.low_quality, updated_at = excluded.updated_at "
+            "WHERE excluded.low_quality <= specs.low_quality",
+            (key, str(gtin), json.dumps(specs, ensure_ascii=False), source_key, int(bool(low_quality)), time.time())
+        )
+        return True
+
+    def import_folder(self, output_folder, is_bad=None):
+        """ Einmalig: Vorhandene JSONs aus output_JSON übernehmen. is_bad(data) -> True bei schlechter Qualität. """
+        if self.query_one("SELECT value FROM meta WHERE key = 'outputs_imported'"):
+            return 0
+        if not os.path.exists(output_folder):
+            return 0
+
+        imported = 0
+        for filename in sorted(os.listdir(output_folder)):
+            if not filename.endswith(".json"): continue
+            try:
+                with open(os.path.join(output_folder, filename), 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            if not isinstance(data, dict): continue
+            low_quality = bool(is_bad(data)) if is_bad else False
+            if self.put(data.get("_Original_GTIN", ""), data, os.path.splitext(filename)[0], low_quality):
+                imported += 1
+
+        self.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('outputs_imported', ?)", (str(time.time()),))
+        return imported
+
+    def count(self):
+        return self.query_one("SELECT COUNT(*) FROM specs WHERE low_quality = 0")[0]
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_spec_store():
+    """ Prozessweit geteilter Spec-Speicher, konfiguriert über modules/config.py. """
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = SpecStore(SPEC_STORE_FILE)
+        return _store
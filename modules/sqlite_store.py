@@ -0,0 +1,50 @@
+import os
+import sqlite3
+import threading
+
+
+class SQLiteStore:
+    """
+    Kleine Basisklasse für unsere SQLite-Dateien (Ledger, Caches).
+    Eine Verbindung pro Datei, geschützt durch ein Lock, damit die
+    parallelen Worker-Threads sie gemeinsam nutzen können.
+    """
+    SCHEMA = ""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        folder = os.path.dirname(db_path)
+        if folder and not os.path.exists(folder):
+            os.makedirs(folder, exist_ok=True)
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        if self.SCHEMA:
+            self.conn.executescript(self.SCHEMA)
+            self.conn.commit()
+
+    def execute(self, sql, params=()):
+        with self._lock:
+            cursor = self.conn.execute(sql, params)
+            self.conn.commit()
+            return cursor.rowcount
+
+    def executemany(self, sql, seq_of_params):
+        with self._lock:
+            cursor = self.conn.executemany(sql, seq_of_params)
+            self.conn.commit()
+            return cursor.rowcount
+
+    def query(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    def query_one(self, sql, params=()):
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()
+
+    def close(self):
+        with self._lock:
+            self.conn.close()
@@ -0,0 +1,264 @@
+import os
+import sys
+import json
+import time
+import logging
+import pandas as pd
+from types import SimpleNamespace
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from modules.config import (
+    setup_folders, OUTPUT_FOLDER, LEDGER_FILE, MAX_CONCURRENT_ARTICLES, POSTPROCESS_WORKERS, DEDUPE_ACROSS_FILES,
+    BATCH_BACKEND, BATCH_FOLDER, BATCH_POLL_SECONDS
+)
+from modules.prompts import get_prompt_by_category, classify_product_type
+from modules.direct_extractor import get_direct_extractor, DIRECT_SETTINGS
+from modules.data_handler import iter_article_chunks, prefetch, STREAM_CHUNK_SIZE
+from modules.job_ledger import JobLedger, FAILED
+from modules.response_cache import get_response_cache, make_cache_key
+from modules.batch_client import write_batch_files, submit_batch, wait_for_batch, iter_batch_results, LocalBatchClient
+from modules.logger import log_error
+from modules.post_processor import run_post_processing
+from main import (
+    collect_input_files, build_dedupe_plan, prefilter_articles, save_result, append_to_retry_csv, check_data_quality,
+    release_leader
+)
+from modules.spec_store import get_spec_store
+
+STATE_FILE = os.path.join(BATCH_FOLDER, "state.json")
+
+
+def get_batch_client(backend=BATCH_BACKEND):
+    if backend == "local":
+        return LocalBatchClient(os.path.join(BATCH_FOLDER, "local"))
+    from modules.prompts import client
+    return client
+
+
+def load_state():
+    if not os.path.exists(STATE_FILE):
+        return None
+    with open(STATE_FILE, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_state(state):
+    os.makedirs(BATCH_FOLDER, exist_ok=True)
+    tmp_path = STATE_FILE + ".tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, STATE_FILE)
+
+
+def _row_to_dict(row):
+    # Nur Textwerte (NaN ist kein JSON) - reicht für Retry-Liste und Fehler-Log
+    return {key: value for key, value in row.items() if isinstance(value, str)}
+
+
+def _is_quota_error(error):
+    err_msg = str(error)
+    return "432" in err_msg or "quota" in err_msg.lower()
+
+
+def _build_one(job, quota_hit=None):
+    """
+    Prompt + Suchergebnisse -> Chat-Completion-Body. Läuft parallel (die Suchen sind der langsame Teil).
+    Gibt (entry, body, cached, error) zurück - Fehler werden pro Artikel zurückgegeben statt den Lauf abzubrechen.
+    """
+    row, article, forced_category = job
+    entry = {
+        "job_key": article.safe_filename,
+        "name": article.name,
+        "gtin": article.gtin,
+        "art_nr": article.art_nr,
+        "json_path": article.json_path,
+        "category": forced_category,
+        "forced_category": forced_category,
+        "cache_key": None,
+        "row": _row_to_dict(row),
+    }
+    # Tavily-Limit schon erreicht -> keine weitere Suche starten, Artikel bleibt offen
+    if quota_hit and quota_hit.is_set():
+        return entry, None, None, None
+    try:
+        entry["category"] = forced_category or classify_product_type(article.name, article.gtin)
+        prompt = get_prompt_by_category(article.name, article.gtin, forced_category=entry["category"])
+        entry["cache_key"] = make_cache_key(prompt, settings=DIRECT_SETTINGS)
+        # Schon einmal beantwortet -> gar nicht erst in den Batch
+        cached = get_response_cache().get(entry["cache_key"])
+        if cached is not None:
+            return entry, None, cached, None
+        return entry, get_direct_extractor().build_request(prompt, article.name, article.gtin), None, None
+    except Exception as e:
+        if _is_quota_error(e) and quota_hit: quota_hit.set()
+        return entry, None, None, e
+
+
+def _fail_entry(entry, error, ledger, plan):
+    """ Artikel konnte nicht vorbereitet werden -> wie im interaktiven Lauf: Error-Log, Retry-Liste, Ledger. """
+    err_msg = str(error)
+    logging.error(f"❌ [Batch] ArtNr: {entry['job_key']} Fehler: {err_msg}")
+    log_error(entry["name"], entry["gtin"], f"Batch-Vorbereitung: {err_msg}")
+    append_to_retry_csv(pd.Series(entry["row"], dtype=object))
+    ledger.mark(entry["job_key"], FAILED, err_msg)
+    if plan: release_leader(plan, entry["job_key"], f"[Batch] ArtNr: {entry['job_key']}")
+
+
+def prepare_batch(input_files, ledger, plan):
+    """
+    Sammelt alle offenen Artikel (gleiche Vorfilter wie main.py) und schreibt Manifest + JSONL-Anfragen.
+    Gibt (Manifest-Pfad, Liste der JSONL-Dateien) zurück.
+    """
+    run_id = time.strftime("%Y%m%d_%H%M%S")
+    manifest_path = os.path.join(BATCH_FOLDER, f"manifest_{run_id}.jsonl")
+    os.makedirs(BATCH_FOLDER, exist_ok=True)
+
+    requests = []
+    seen = set()
+    from_cache = failed = 0
+    quota_hit = threading.Event()
+    with open(manifest_path, 'w', encoding='utf-8') as manifest, ThreadPoolExecutor(max_workers=MAX_CONCURRENT_ARTICLES) as executor:
+        for file_path, forced_cat, label in input_files:
+            if quota_hit.is_set(): break
+            if ledger.is_file_complete(file_path, OUTPUT_FOLDER):
+                continue
+            logging.info(f"\n📂 Lade {label}")
+            for df in prefetch(iter_article_chunks(file_path, STREAM_CHUNK_SIZE)):
+                if quota_hit.is_set(): break
+                if df.empty: continue
+                # Wartende gleiche Artikel bekommen beim Abholen per fan_out eine Kopie
+                try:
+                    todo, _ = prefilter_articles(df, forced_cat, ledger, file_path, plan)
+                except Exception as e:
+                    # Block bleibt im Ledger offen, bereits vorbereitete Anfragen gehen trotzdem raus
+                    logging.exception(f"❌ Vorfilter fehlgeschlagen ({file_path}): {e!r}")
+                    if _is_quota_error(e): quota_hit.set()
+                    continue
+                jobs = [
+                    (row, article, forced_cat)
+                    for (_, row), article in zip(df.loc[todo.index].iterrows(), todo.itertuples(index=False))
+                    if article.safe_filename not in seen
+                ]
+                seen.update(article.safe_filename for _, article, _ in jobs)
+
+                futures = [executor.submit(_build_one, job, quota_hit) for job in jobs]
+                for future in as_completed(futures):
+                    entry, body, cached, error = future.result()
+                    if error is not None and not _is_quota_error(error):
+                        _fail_entry(entry, error, ledger, plan)
+                        failed += 1
+                        continue
+                    if body is None and cached is None:
+                        continue   # Tavily-Limit -> bleibt im Ledger offen für den nächsten Lauf
+                    if cached is not None:
+                        if _save_entry(entry, cached, ledger, plan) is None:
+                            get_response_cache().delete(entry["cache_key"])
+                        from_cache += 1
+                        continue
+                    manifest.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                    requests.append((entry["job_key"], body))
+
+    if quota_hit.is_set():
+        logging.critical("🛑 TAVILY LIMIT ERREICHT. Bereits vorbereitete Anfragen werden trotzdem eingereicht.")
+    if failed:
+        logging.warning(f"⚠️  {failed} Artikel konnten nicht vorbereitet werden (siehe Error-Log / Retry-Liste).")
+    if from_cache:
+        logging.info(f"💾 {from_cache} Artikel direkt aus dem Antwort-Cache gespeichert.")
+    paths = write_batch_files(requests, BATCH_FOLDER, prefix=f"requests_{run_id}")
+    logging.info(f"📝 {len(requests)} Anfragen in {len(paths)} Batch-Datei(en) geschrieben.")
+    return manifest_path, paths
+
+
+def _save_entry(entry, response_text, ledger, plan):
+    article = SimpleNamespace(
+        name=entry["name"], gtin=entry["gtin"], art_nr=entry["art_nr"],
+        safe_filename=entry["job_key"], json_path=entry["json_path"]
+    )
+    log_prefix = f"[Batch] ArtNr: {entry['job_key']}"
+    return save_result(response_text, pd.Series(entry["row"], dtype=object), article, entry["category"], log_prefix,
+                entry["forced_category"], ledger, plan)
+
+
+def collect_batch(client, batch, manifest, ledger, plan):
+    """ Ergebnisse durch denselben Weg wie im interaktiven Lauf: JSON, Qualitäts-Check, output_JSON, Ledger. """
+    saved = failed = 0
+    cache = get_response_cache()
+    for custom_id, response_text, error in iter_batch_results(client, batch):
+        entry = manifest.get(custom_id)
+        if entry is None: continue
+        if error:
+            logging.error(f"❌ [Batch] ArtNr: {custom_id} Fehler: {error}")
+            log_error(entry["name"], entry["gtin"], f"Batch: {error}")
+            append_to_retry_csv(pd.Series(entry["row"], dtype=object))
+            ledger.mark(custom_id, FAILED, error)
+            # Wartende gleiche Artikel bleiben im Ledger offen -> nächster Batch-Lauf
+            if plan: release_leader(plan, custom_id, f"[Batch] ArtNr: {custom_id}")
+            failed += 1
+            continue
+        if _save_entry(entry, response_text, ledger, plan) is None:
+            failed += 1
+            continue
+        # Erst nach erfolgreichem Speichern: gleicher Cache-Schlüssel wie die Direkt-Extraktion -> spätere Läufe/Replays treffen den Cache
+        cache.put(entry["cache_key"], response_text)
+        saved += 1
+    return saved, failed
+
+
+def main(backend=BATCH_BACKEND, stop_event=None):
+    setup_folders()
+    client = get_batch_client(backend)
+    logging.info(f"🚀 Starte Batch-Modus ({backend})...")
+
+    ledger = JobLedger(LEDGER_FILE)
+    ledger.import_existing_outputs(OUTPUT_FOLDER)
+    get_spec_store().import_folder(OUTPUT_FOLDER, is_bad=lambda data: check_data_quality(data)[0])
+
+    input_files = collect_input_files()
+    plan = build_dedupe_plan(input_files, ledger) if DEDUPE_ACROSS_FILES else None
+
+    # Offener Lauf (z.B. nach Neustart)? Dann nur noch abholen statt neu einzureichen.
+    state = load_state()
+    if state and all(b["collected"] for b in state["batches"]):
+        state = None
+    if state:
+        logging.info(f"📬 Setze Batch-Lauf fort: {len(state['batches'])} Job(s) aus {state['manifest']}")
+    else:
+        manifest_path, paths = prepare_batch(input_files, ledger, plan)
+        if not paths:
+            logging.info("✅ Nichts einzureichen.")
+            return
+        state = {"manifest": manifest_path, "batches": []}
+        for path in paths:
+            batch = submit_batch(client, path, metadata={"source": os.path.basename(path)})
+            state["batches"].append({"id": batch.id, "file": path, "collected": False})
+            save_state(state)
+            logging.info(f"📤 Batch eingereicht: {batch.id} ({os.path.basename(path)})")
+
+    with open(state["manifest"], 'r', encoding='utf-8') as f:
+        manifest = {entry["job_key"]: entry for entry in map(json.loads, f)}
+
+    for item in state["batches"]:
+        if item["collected"]: continue
+        batch = wait_for_batch(client, item["id"], poll_seconds=BATCH_POLL_SECONDS, log=logging.info, stop_event=stop_event)
+        if stop_event and stop_event.is_set():
+            logging.info("🛑 Abgebrochen - der Lauf kann später fortgesetzt werden.")
+            return
+        saved, failed = collect_batch(client, batch, manifest, ledger, plan)
+        logging.info(f"📥 Batch {item['id']} ({batch.status}): {saved} gespeichert | {failed} Fehler")
+        item["collected"] = True
+        save_state(state)
+
+    logging.info("🔄 Starte Post-Processing...")
+    run_post_processing(
+        OUTPUT_FOLDER,
+        html_folder="output_HTML",
+        template_path="templates/template.html",
+        marvin_folder="output_JSON_Marvin",
+        workers=POSTPROCESS_WORKERS,
+        log=logging.info
+    )
+    logging.info("✅ FERTIG.")
+
+
+if __name__ == "__main__":
+    main(backend=sys.argv[1] if len(sys.argv) > 1 else BATCH_BACKEND)
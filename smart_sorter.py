@@ -1,6 +1,8 @@
 import os
 import pandas as pd
 import shutil
+from modules.keyword_matcher import KeywordMatcher
+from modules.data_handler import read_csv_sniffed, read_excel_cached
 
 # --- KONFIGURATION ---
 # Die Datei, die wir sortieren wollen (liegt im Master_Excel Ordner)
@@ -32,6 +34,9 @@ KEYWORD_RULES = {
     "42_USB_Sticks": ["usb stick", "flash drive", "pen drive", "speicherstick"]
 }
 
+# Einmal kompiliert, findet alle Keywords in einem Durchlauf (Priorität = Reihenfolge oben)
+KEYWORD_MATCHER = KeywordMatcher(KEYWORD_RULES.items())
+
 def sort_master_excel():
     print(f"🚀 Starte Smart-Sorter für: {INPUT_FILE}")
     
@@ -39,46 +44,32 @@ def sort_master_excel():
     try:
         # Check ob Excel oder CSV
         if INPUT_FILE.endswith(".xlsx"):
-            df = pd.read_excel(INPUT_FILE, dtype=str).fillna("")
+            df = read_excel_cached(INPUT_FILE).fillna("")
         else:
-            df = pd.read_csv(INPUT_FILE, dtype=str, sep=None, engine='python').fillna("")
+            df = read_csv_sniffed(INPUT_FILE).fillna("")
             
         print(f"📦 {len(df)} Artikel geladen.")
     except Exception as e:
         print(f"❌ Fehler beim Laden: {e}")
         return
 
-    # Dictionary um DataFrames für jede Kategorie zu sammeln
-    sorted_data = {cat: [] for cat in KEYWORD_RULES.keys()}
-    sorted_data["Unsortiert"] = [] # Reste-Rampe
-
     # 2. Sortier-Logik
-    for index, row in df.iterrows():
-        # Namen normalisieren (alles klein) für Suche
-        name_raw = str(row.get('Produktname', row.get('Artikelname', ''))).lower()
-        
-        # Priorisierte Suche: Zuerst spezifische, dann generische
-        found_category = None
-        
-        for category, keywords in KEYWORD_RULES.items():
-            for kw in keywords:
-                # WICHTIG: Wortgrenzen beachten ist hier schwer, einfache Suche reicht meist
-                if kw in name_raw:
-                    found_category = category
-                    break
-            if found_category:
-                break
-        
-        if found_category:
-            sorted_data[found_category].append(row)
-        else:
-            sorted_data["Unsortiert"].append(row)
+    # Namen normalisieren (alles klein) für Suche
+    name_col = 'Produktname' if 'Produktname' in df.columns else 'Artikelname'
+    names = df[name_col].str.lower() if name_col in df.columns else pd.Series("", index=df.index)
+
+    # Priorisierte Suche: Zuerst spezifische, dann generische (Reihenfolge in KEYWORD_RULES)
+    found = names.map(KEYWORD_MATCHER.match).fillna("Unsortiert")
+
+    # Dictionary um DataFrames für jede Kategorie zu sammeln
+    sorted_data = {cat: df[found == cat] for cat in KEYWORD_RULES.keys()}
+    sorted_data["Unsortiert"] = df[found == "Unsortiert"] # Reste-Rampe
 
     # 3. Speichern in die Ordner
     print("\n💾 Speichere sortierte Dateien...")
     
     for category, rows in sorted_data.items():
-        if not rows: continue # Leere Kategorien überspringen
+        if rows.empty: continue # Leere Kategorien überspringen
         
         # Ziel-Ordner bestimmen
         if category == "Unsortiert":
@@ -93,12 +84,10 @@ def sort_master_excel():
         # Ordner erstellen falls nicht existiert
         os.makedirs(target_dir, exist_ok=True)
         
-        # DataFrame erstellen und speichern
-        df_cat = pd.DataFrame(rows)
         save_path = os.path.join(target_dir, filename)
         
         # Als CSV speichern (UTF-8, Semikolon getrennt für Excel-Kompatibilität)
-        df_cat.to_csv(save_path, index=False, sep=';', encoding='utf-8-sig')
+        rows.to_csv(save_path, index=False, sep=';', encoding='utf-8-sig')
         
         print(f"   📂 {category}: {len(rows)} Artikel -> {save_path}")
 
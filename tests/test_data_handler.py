@@ -0,0 +1,57 @@
+import pandas as pd
+from modules.data_handler import SNIFF_SAMPLE_BYTES, sniff_csv_format, read_csv_sniffed, iter_article_chunks
+
+
+def _write_cp1252_export(path):
+    """ Windows-Export: die ersten 64 KB sind reines ASCII, Umlaute kommen erst danach. """
+    lines = ["Artikelnummer;Artikelname;GTIN"]
+    size = len(lines[0]) + 1
+    i = 0
+    while size < SNIFF_SAMPLE_BYTES + 1024:
+        lines.append(f"A{i:06d};Standard Artikel {i};")
+        size += len(lines[-1]) + 1
+        i += 1
+    lines.append("X1;Gehäuselüfter Weiß;4001234567890")
+    path.write_bytes(("\n".join(lines) + "\n").encode("cp1252"))
+    return i + 1
+
+
+def test_non_ascii_after_sample_is_decoded(tmp_path):
+    path = tmp_path / "export.csv"
+    rows = _write_cp1252_export(path)
+
+    df = read_csv_sniffed(str(path))
+    assert len(df) == rows
+    assert df["Artikelname"].iloc[-1] == "Gehäuselüfter Weiß"
+    assert sniff_csv_format(str(path))[0] == "cp1252"
+
+
+def test_streaming_switches_encoding_without_losing_rows(tmp_path):
+    path = tmp_path / "export.csv"
+    rows = _write_cp1252_export(path)
+
+    df = pd.concat(iter_article_chunks(str(path), chunksize=200))
+    assert len(df) == rows
+    assert df["Artikelname"].iloc[-1] == "Gehäuselüfter Weiß"
+    assert not df["Artikelname"].str.contains("�").any()
+
+
+def test_streamed_excel_header_matches_read_excel(tmp_path):
+    from openpyxl import Workbook
+
+    path = tmp_path / "artikel.xlsx"
+    wb = Workbook()
+    wb.active.append(["Artikelnummer", "GTIN", None, "GTIN", "GTIN.1", "GTIN", 2024, "Artikelname"])
+    wb.active.append(["1", "4001", "x", "4002", "4003", "4004", "y", "Foo"])
+    wb.save(path)
+
+    expected = [str(c) for c in pd.read_excel(path, dtype=str).columns]
+    assert list(next(iter_article_chunks(str(path))).columns) == expected
+
+
+def test_chunks_keep_file_row_numbers(tmp_path):
+    path = tmp_path / "export.csv"
+    path.write_text("Artikelnummer;Artikelname\n" + "".join(f"{i};Artikel {i}\n" for i in range(25)), encoding="utf-8")
+
+    chunks = list(iter_article_chunks(str(path), chunksize=10))
+    assert [(c.index[0], c.index[-1]) for c in chunks] == [(0, 9), (10, 19), (20, 24)]